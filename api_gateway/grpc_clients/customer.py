@@ -1,63 +1,169 @@
-import grpc
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from crm_pb2 import *
 from crm_pb2_grpc import *
+from common.grpc_options import CALL_TIMEOUT, ChannelPool
+from grpc_clients.singleflight import SingleFlight, coalesced
+
+
+def _customer_to_dict(customer):
+    return {
+        "id": customer.id,
+        "name": customer.name,
+        "email": customer.email,
+        "created_at": customer.created_at
+    }
+
+
+def _batch_error_to_dict(error):
+    return {
+        "index": error.index,
+        "code": error.code,
+        "message": error.message
+    }
+
 
 class CustomerClient:
     def __init__(self, host='localhost', port=50051):
-        self.channel = grpc.insecure_channel(f"{host}:{port}")
-        self.client = CustomerServiceStub(self.channel)
+        self.channels = ChannelPool(f"{host}:{port}", CustomerServiceStub)
+
+    @property
+    def client(self):
+        return self.channels.stub()
+
+    def close(self):
+        self.channels.close()
         
     def create(self, name, email):
         request = CreateCustomerRequest(name=name, email=email)
-        response = self.client.CreateCustomer(request)
-        return {
-            "id": response.id,
-            "name": response.name,
-            "email": response.email,
-            "created_at": response.created_at
-        }
+        response = self.client.CreateCustomer(request, timeout=CALL_TIMEOUT)
+        return _customer_to_dict(response)
     
     def get(self, id):
         request = GetCustomerRequest(id=id)
-        response = self.client.GetCustomer(request)
+        response = self.client.GetCustomer(request, timeout=CALL_TIMEOUT)
         if not response.id:
             raise ValueError("Customer not found")
-        return {
-            "id": response.id,
-            "name": response.name,
-            "email": response.email,
-            "created_at": response.created_at
-        }
+        return _customer_to_dict(response)
     
     def update(self, id, name, email):
         request = UpdateCustomerRequest(id=id, name=name, email=email)
-        response = self.client.UpdateCustomer(request)
-        return {
-            "id": response.id,
-            "name": response.name,
-            "email": response.email,
-            "created_at": response.created_at
-        }
+        response = self.client.UpdateCustomer(request, timeout=CALL_TIMEOUT)
+        return _customer_to_dict(response)
     
     def delete(self, id):
         request = DeleteCustomerRequest(id=id)
-        response = self.client.DeleteCustomer(request)
+        response = self.client.DeleteCustomer(request, timeout=CALL_TIMEOUT)
         return {"success": response.success}
     
-    def list_customers(self, page: int, limit: int):
-        request = ListCustomersRequest(page=page, limit=limit)
-        response = self.client.ListCustomers(request)
+    def list_customers(self, page: int, limit: int, cursor: str = "", count_mode=COUNT_MAINTAINED):
+        request = ListCustomersRequest(page=page, limit=limit, cursor=cursor, count_mode=count_mode)
+        response = self.client.ListCustomers(request, timeout=CALL_TIMEOUT)
+        return {
+            "customers": [_customer_to_dict(customer) for customer in response.customers],
+            "total": response.total if response.HasField("total") else None,
+            "next_cursor": response.next_cursor
+        }
+    def batch_create(self, customers):
+        request = BatchCreateCustomersRequest(customers=[
+            CreateCustomerRequest(name=customer["name"], email=customer["email"])
+            for customer in customers
+        ])
+        response = self.client.BatchCreateCustomers(request, timeout=CALL_TIMEOUT)
         return {
-            "customers": [
-                {
-                    "id": customer.id,
-                    "name": customer.name,
-                    "email": customer.email,
-                    "created_at": customer.created_at
-                } for customer in response.customers
-            ],
-            "total": response.total
-        }
\ No newline at end of file
+            "customers": [_customer_to_dict(customer) for customer in response.customers],
+            "errors": [_batch_error_to_dict(error) for error in response.errors]
+        }
+
+    def search(self, query, limit=20):
+        request = SearchCustomersRequest(query=query, limit=limit)
+        response = self.client.SearchCustomers(request, timeout=CALL_TIMEOUT)
+        return [_customer_to_dict(customer) for customer in response.customers]
+
+    def batch_get(self, ids):
+        """Returns the customers that exist, keyed by id."""
+        response = self.client.BatchGetCustomers(BatchGetCustomersRequest(ids=ids), timeout=CALL_TIMEOUT)
+        return {customer.id: _customer_to_dict(customer) for customer in response.customers}
+
+
+class AsyncCustomerClient:
+    """grpc.aio version of CustomerClient for use inside the event loop.
+
+    The channel is opened by connect() and closed by close(), which the
+    gateway calls from its lifespan handler.
+    """
+
+    def __init__(self, host='localhost', port=50051):
+        self.target = f"{host}:{port}"
+        self.channels = None
+        # Identical reads in flight at the same time share one call.
+        self.flights = SingleFlight()
+
+    async def connect(self):
+        if self.channels is None:
+            self.channels = ChannelPool(self.target, CustomerServiceStub, aio=True)
+
+    async def close(self):
+        if self.channels is not None:
+            await self.channels.aclose()
+            self.channels = None
+
+    @property
+    def client(self):
+        return self.channels.stub()
+
+    async def create(self, name, email):
+        request = CreateCustomerRequest(name=name, email=email)
+        response = await self.client.CreateCustomer(request, timeout=CALL_TIMEOUT)
+        return _customer_to_dict(response)
+
+    @coalesced
+    async def get(self, id):
+        request = GetCustomerRequest(id=id)
+        response = await self.client.GetCustomer(request, timeout=CALL_TIMEOUT)
+        if not response.id:
+            raise ValueError("Customer not found")
+        return _customer_to_dict(response)
+
+    async def update(self, id, name, email):
+        request = UpdateCustomerRequest(id=id, name=name, email=email)
+        response = await self.client.UpdateCustomer(request, timeout=CALL_TIMEOUT)
+        return _customer_to_dict(response)
+
+    async def delete(self, id):
+        request = DeleteCustomerRequest(id=id)
+        response = await self.client.DeleteCustomer(request, timeout=CALL_TIMEOUT)
+        return {"success": response.success}
+
+    @coalesced
+    async def list_customers(self, page: int, limit: int, cursor: str = "", count_mode=COUNT_MAINTAINED):
+        request = ListCustomersRequest(page=page, limit=limit, cursor=cursor, count_mode=count_mode)
+        response = await self.client.ListCustomers(request, timeout=CALL_TIMEOUT)
+        return {
+            "customers": [_customer_to_dict(customer) for customer in response.customers],
+            "total": response.total if response.HasField("total") else None,
+            "next_cursor": response.next_cursor
+        }
+
+    async def batch_create(self, customers):
+        request = BatchCreateCustomersRequest(customers=[
+            CreateCustomerRequest(name=customer["name"], email=customer["email"])
+            for customer in customers
+        ])
+        response = await self.client.BatchCreateCustomers(request, timeout=CALL_TIMEOUT)
+        return {
+            "customers": [_customer_to_dict(customer) for customer in response.customers],
+            "errors": [_batch_error_to_dict(error) for error in response.errors]
+        }
+
+    @coalesced
+    async def search(self, query, limit=20):
+        request = SearchCustomersRequest(query=query, limit=limit)
+        response = await self.client.SearchCustomers(request, timeout=CALL_TIMEOUT)
+        return [_customer_to_dict(customer) for customer in response.customers]
+
+    async def batch_get(self, ids):
+        """Returns the customers that exist, keyed by id."""
+        response = await self.client.BatchGetCustomers(BatchGetCustomersRequest(ids=ids), timeout=CALL_TIMEOUT)
+        return {customer.id: _customer_to_dict(customer) for customer in response.customers}
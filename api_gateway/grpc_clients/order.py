@@ -4,12 +4,47 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from crm_pb2 import *
 from crm_pb2_grpc import *
+from common.grpc_options import CALL_TIMEOUT, EXPORT_TIMEOUT, ChannelPool
+from grpc_clients.singleflight import SingleFlight, coalesced
+
+
+def _order_to_dict(order):
+    return {
+        'id': order.id,
+        'customer_id': order.customer_id,
+        'product_name': order.product_name,
+        'price': order.price,
+        'created_at': order.created_at
+    }
+
+
+def _stats_to_dict(stats):
+    return {
+        'customer_id': stats.customer_id,
+        'order_count': stats.order_count,
+        'total_spent': stats.total_spent,
+        'last_order_at': stats.last_order_at or None
+    }
+
+
+def _batch_error_to_dict(error):
+    return {
+        'index': error.index,
+        'code': error.code,
+        'message': error.message
+    }
 
 
 class OrderClient:
     def __init__(self, host='localhost', port=50052):
-        self.channel = grpc.insecure_channel(f"{host}:{port}")
-        self.client = OrderServiceStub(self.channel)
+        self.channels = ChannelPool(f"{host}:{port}", OrderServiceStub)
+
+    @property
+    def client(self):
+        return self.channels.stub()
+
+    def close(self):
+        self.channels.close()
     
     def create(self, customer_id, product_name, price):
         request = CreateOrderRequest(
@@ -17,49 +52,224 @@ class OrderClient:
             product_name=product_name,
             price=price
         )
-        response = self.client.CreateOrder(request)
-        return {
-            'id': response.id,
-            'customer_id': response.customer_id,
-            'product_name': response.product_name,
-            'price': response.price,
-            'created_at': response.created_at
-        }
+        response = self.client.CreateOrder(request, timeout=CALL_TIMEOUT)
+        return _order_to_dict(response)
     
     def get(self, customer_id):
         request = GetCustomerOrderRequest(customer_id=customer_id)
-        response = self.client.GetCustomerOrder(request)
-        return {
-            'id': response.id,
-            'customer_id': response.customer_id,
-            'product_name': response.product_name,
-            'price': response.price,
-            'created_at': response.created_at
-        }
+        response = self.client.GetCustomerOrder(request, timeout=CALL_TIMEOUT)
+        return _order_to_dict(response)
     
-    def list_orders(self, page: int, limit: int):
+    def list_orders(
+        self, page: int, limit: int, cursor: str = "", count_mode=COUNT_MAINTAINED,
+        created_from: str = "", created_to: str = ""
+    ):
         try:
-            if page <= 0 or limit <= 0:
+            if limit <= 0 or (not cursor and page <= 0):
                 raise ValueError("Отрицательное число")
 
-            request = ListOrdersRequest(page=page, limit=limit)
-            response = self.client.ListOrders(request)
+            request = ListOrdersRequest(
+                page=page, limit=limit, cursor=cursor, count_mode=count_mode,
+                created_from=created_from, created_to=created_to
+            )
+            response = self.client.ListOrders(request, timeout=CALL_TIMEOUT)
             return {
-                "orders": [
-                    {
-                        'id': order.id,
-                        'customer_id': order.customer_id,
-                        'product_name': order.product_name,
-                        'price': order.price,
-                        'created_at': order.created_at
-                    } for order in response.orders
-                ],
-                "total": response.total
+                "orders": [_order_to_dict(order) for order in response.orders],
+                "total": response.total if response.HasField("total") else None,
+                "next_cursor": response.next_cursor
             }
         except grpc.RpcError as e:
             raise Exception(f"gRPC error: {e.details()}")
+
+    def list_customer_orders(self, customer_id, page: int, limit: int, cursor: str = "",
+                             count_mode=COUNT_MAINTAINED):
+        request = ListCustomerOrdersRequest(
+            customer_id=customer_id,
+            page=page,
+            limit=limit,
+            cursor=cursor,
+            count_mode=count_mode
+        )
+        response = self.client.ListCustomerOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "total": response.total if response.HasField("total") else None,
+            "next_cursor": response.next_cursor
+        }
         
     def delete(self, order_id):
         request = DeleteOrderRequest(id=order_id)
-        response = self.client.DeleteOrder(request)
-        return {"success": response.success}
\ No newline at end of file
+        response = self.client.DeleteOrder(request, timeout=CALL_TIMEOUT)
+        return {"success": response.success}
+    def batch_create(self, orders):
+        request = BatchCreateOrdersRequest(orders=[
+            CreateOrderRequest(
+                customer_id=order['customer_id'],
+                product_name=order['product_name'],
+                price=order['price']
+            ) for order in orders
+        ])
+        response = self.client.BatchCreateOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "errors": [_batch_error_to_dict(error) for error in response.errors]
+        }
+    def export_orders(self, customer_id="", created_from="", created_to=""):
+        request = ExportOrdersRequest(
+            customer_id=customer_id,
+            created_from=created_from,
+            created_to=created_to
+        )
+        for order in self.client.ExportOrders(request, timeout=EXPORT_TIMEOUT):
+            yield _order_to_dict(order)
+
+    def get_customer_stats(self, customer_id):
+        request = GetCustomerStatsRequest(customer_id=customer_id)
+        response = self.client.GetCustomerStats(request, timeout=CALL_TIMEOUT)
+        return _stats_to_dict(response)
+
+    def list_archived_orders(self, limit: int, cursor: str = "", customer_id: str = "",
+                             created_from: str = "", created_to: str = ""):
+        request = ListArchivedOrdersRequest(
+            limit=limit,
+            cursor=cursor,
+            customer_id=customer_id,
+            created_from=created_from,
+            created_to=created_to
+        )
+        response = self.client.ListArchivedOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "next_cursor": response.next_cursor
+        }
+
+
+class AsyncOrderClient:
+    """grpc.aio version of OrderClient for use inside the event loop.
+
+    The channel is opened by connect() and closed by close(), which the
+    gateway calls from its lifespan handler.
+    """
+
+    def __init__(self, host='localhost', port=50052):
+        self.target = f"{host}:{port}"
+        self.channels = None
+        # Identical reads in flight at the same time share one call.
+        self.flights = SingleFlight()
+
+    async def connect(self):
+        if self.channels is None:
+            self.channels = ChannelPool(self.target, OrderServiceStub, aio=True)
+
+    async def close(self):
+        if self.channels is not None:
+            await self.channels.aclose()
+            self.channels = None
+
+    @property
+    def client(self):
+        return self.channels.stub()
+
+    async def create(self, customer_id, product_name, price):
+        request = CreateOrderRequest(
+            customer_id=customer_id,
+            product_name=product_name,
+            price=price
+        )
+        response = await self.client.CreateOrder(request, timeout=CALL_TIMEOUT)
+        return _order_to_dict(response)
+
+    @coalesced
+    async def get(self, customer_id):
+        request = GetCustomerOrderRequest(customer_id=customer_id)
+        response = await self.client.GetCustomerOrder(request, timeout=CALL_TIMEOUT)
+        return _order_to_dict(response)
+
+    @coalesced
+    async def list_orders(
+        self, page: int, limit: int, cursor: str = "", count_mode=COUNT_MAINTAINED,
+        created_from: str = "", created_to: str = ""
+    ):
+        try:
+            if limit <= 0 or (not cursor and page <= 0):
+                raise ValueError("Отрицательное число")
+
+            request = ListOrdersRequest(
+                page=page, limit=limit, cursor=cursor, count_mode=count_mode,
+                created_from=created_from, created_to=created_to
+            )
+            response = await self.client.ListOrders(request, timeout=CALL_TIMEOUT)
+            return {
+                "orders": [_order_to_dict(order) for order in response.orders],
+                "total": response.total if response.HasField("total") else None,
+                "next_cursor": response.next_cursor
+            }
+        except grpc.RpcError as e:
+            raise Exception(f"gRPC error: {e.details()}")
+
+    @coalesced
+    async def list_customer_orders(self, customer_id, page: int, limit: int, cursor: str = "",
+                                   count_mode=COUNT_MAINTAINED):
+        request = ListCustomerOrdersRequest(
+            customer_id=customer_id,
+            page=page,
+            limit=limit,
+            cursor=cursor,
+            count_mode=count_mode
+        )
+        response = await self.client.ListCustomerOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "total": response.total if response.HasField("total") else None,
+            "next_cursor": response.next_cursor
+        }
+
+    async def delete(self, order_id):
+        request = DeleteOrderRequest(id=order_id)
+        response = await self.client.DeleteOrder(request, timeout=CALL_TIMEOUT)
+        return {"success": response.success}
+
+    async def batch_create(self, orders):
+        request = BatchCreateOrdersRequest(orders=[
+            CreateOrderRequest(
+                customer_id=order['customer_id'],
+                product_name=order['product_name'],
+                price=order['price']
+            ) for order in orders
+        ])
+        response = await self.client.BatchCreateOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "errors": [_batch_error_to_dict(error) for error in response.errors]
+        }
+
+    async def export_orders(self, customer_id="", created_from="", created_to=""):
+        request = ExportOrdersRequest(
+            customer_id=customer_id,
+            created_from=created_from,
+            created_to=created_to
+        )
+        async for order in self.client.ExportOrders(request, timeout=EXPORT_TIMEOUT):
+            yield _order_to_dict(order)
+
+    @coalesced
+    async def get_customer_stats(self, customer_id):
+        request = GetCustomerStatsRequest(customer_id=customer_id)
+        response = await self.client.GetCustomerStats(request, timeout=CALL_TIMEOUT)
+        return _stats_to_dict(response)
+
+    @coalesced
+    async def list_archived_orders(self, limit: int, cursor: str = "", customer_id: str = "",
+                                   created_from: str = "", created_to: str = ""):
+        request = ListArchivedOrdersRequest(
+            limit=limit,
+            cursor=cursor,
+            customer_id=customer_id,
+            created_from=created_from,
+            created_to=created_to
+        )
+        response = await self.client.ListArchivedOrders(request, timeout=CALL_TIMEOUT)
+        return {
+            "orders": [_order_to_dict(order) for order in response.orders],
+            "next_cursor": response.next_cursor
+        }
@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+
+# Set to 0 to send every read to the backend, e.g. when measuring it.
+COALESCE_READS = os.getenv("GRPC_COALESCE_READS", "1") == "1"
+
+
+class SingleFlight:
+    """Lets concurrent identical calls share one in-flight call.
+
+    The first caller for a key starts the call; callers arriving while it
+    runs wait for the same result or exception instead of sending their
+    own. Results are shared, so callers must not modify them.
+
+    The call runs in its own task, so a caller that is cancelled (for
+    example because its HTTP client went away) does not cancel it for the
+    others. Not thread-safe: use it from a single event loop.
+    """
+
+    def __init__(self, enabled=COALESCE_READS):
+        self.enabled = enabled
+        self._calls = {}
+        # method -> [calls sent to the backend, calls that shared one]
+        self._counts = {}
+
+    async def do(self, key, method, fn):
+        counts = self._counts.setdefault(method, [0, 0])
+        if not self.enabled:
+            counts[0] += 1
+            return await fn()
+        task = self._calls.get(key)
+        if task is None:
+            counts[0] += 1
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(functools.partial(self._finish, key))
+        else:
+            counts[1] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Marks the exception as retrieved even if every caller left.
+            task.exception()
+
+    def stats(self):
+        return {
+            method: {"executed": executed, "shared": shared}
+            for method, (executed, shared) in self._counts.items()
+        }
+
+
+def coalesced(method):
+    """Routes calls of a client's read method through its self.flights.
+
+    Calls with equal arguments are identical; the arguments must be
+    hashable.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return await self.flights.do(key, method.__name__, lambda: method(self, *args, **kwargs))
+    return wrapper
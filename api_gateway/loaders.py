@@ -0,0 +1,62 @@
+"""Per-request batching of lookups, in the style of DataLoader.
+
+Code that needs one item calls load(key) and awaits it. All keys asked
+for during one turn of the event loop go out together as a single batch
+call, and a key asked for twice within the request is fetched once.
+"""
+import asyncio
+
+
+class DataLoader:
+    """Coalesces load() calls into calls of batch_fn(keys).
+
+    batch_fn returns a dict of the values it found; keys missing from it
+    resolve to None. A loader caches for its whole lifetime, so create
+    one per request.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=None):
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._futures = {}
+        self._queue = []
+        # The loop only keeps weak references to tasks; without these a
+        # running batch could be collected and its load() futures hang.
+        self._tasks = set()
+
+    def load(self, key):
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._queue:
+                # Runs once the callers queued in this turn have yielded.
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        return future
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        size = self._max_batch_size or len(keys)
+        for start in range(0, len(keys), size):
+            task = asyncio.ensure_future(self._load_batch(keys[start:start + size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, keys):
+        try:
+            values = await self._batch_fn(keys)
+        except Exception as e:
+            for key in keys:
+                # A failed batch is not cached; the next load() retries it.
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(values.get(key))
@@ -15,14 +15,40 @@ import os
 from models import *
 from typing import List
 from fastapi.staticfiles import StaticFiles
-from grpc_clients.customer import CustomerClient
-from grpc_clients.order import OrderClient
-from fastapi import Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import json
+from grpc_clients.customer import AsyncCustomerClient
+from grpc_clients.order import AsyncOrderClient
+from loaders import DataLoader
+from fastapi import Query, Response
+from typing import Literal, Optional
+from contextlib import asynccontextmanager
+from common.cache import LRUCache
+from common.metrics import cache_collector, singleflight_collector
+from timing import REGISTRY as METRICS, TimedClient, TimingMiddleware, timed
+import time
 
 
 load_dotenv()
 
-app = FastAPI()
+# Calls through these clients show up as the "customer" and "order"
+# phases of the Server-Timing header and /metrics.
+customer_client = TimedClient(AsyncCustomerClient(), "customer")
+order_client = TimedClient(AsyncOrderClient(), "order")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await customer_client.connect()
+    await order_client.connect()
+    try:
+        yield
+    finally:
+        await customer_client.close()
+        await order_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,23 +56,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Server-Timing"],
 )
+app.add_middleware(TimingMiddleware)
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-customer_client = CustomerClient()
-order_client = OrderClient()
+# The list routes only compute a total when asked to via ?count=, and
+# return it in the X-Total-Count header.
+COUNT_MODES = {
+    "none": COUNT_NONE,
+    "maintained": COUNT_MAINTAINED,
+    "exact": COUNT_EXACT,
+}
+
+# Orders are written to the export stream in groups of this many lines.
+EXPORT_FLUSH_LINES = 500
+
+# Largest BatchGetCustomers call a loader makes; matches the customer
+# service's MAX_BATCH_SIZE.
+CUSTOMER_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified tokens mapped to their subject. Each entry expires at the
+# token's own exp, so a cached token is never accepted past its lifetime.
+token_cache = LRUCache(maxsize=int(os.getenv("JWT_CACHE_SIZE", "10000")))
+METRICS.register_collector(cache_collector(token_cache, "jwt"))
+METRICS.register_collector(singleflight_collector({
+    "customer": customer_client.flights,
+    "order": order_client.flights,
+}))
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    with timed("auth"):
+        return _verify_token(token)
+
+def _verify_token(token):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    username = token_cache.get(token)
+    if username is not None:
+        return username
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -54,6 +110,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except PyJWTError:
         raise credentials_exception
+    if "exp" in payload:
+        token_cache.set(token, username, ttl=payload["exp"] - time.time())
     return username
 
 def create_access_token(data: dict):
@@ -79,28 +137,72 @@ async def login(user: UserLogin):
 @app.post("/customers", response_model=CustomerResponse)
 async def create_customer(customer: CustomerCreate, current_user: str = Depends(get_current_user)):
     try:
-        response = customer_client.create(name=customer.name, email=customer.email)
-        return CustomerResponse(
-            id=response["id"],
-            name=response["name"],
-            email=response["email"],
-            created_at=response["created_at"]
-        )
+        response = await customer_client.create(name=customer.name, email=customer.email)
+        with timed("render"):
+            return CustomerResponse(
+                id=response["id"],
+                name=response["name"],
+                email=response["email"],
+                created_at=response["created_at"]
+            )
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.ALREADY_EXISTS:
             raise HTTPException(status_code=400, detail="Email already exists")
         raise HTTPException(status_code=400, detail=e.details())
 
+@app.post("/customers/batch", response_model=CustomerBatchResponse)
+async def batch_create_customers(
+    customers: List[CustomerCreate],
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        response = await customer_client.batch_create(
+            [customer.model_dump() for customer in customers]
+        )
+        with timed("render"):
+            return CustomerBatchResponse(
+                customers=[CustomerResponse(**customer) for customer in response["customers"]],
+                errors=[BatchError(**error) for error in response["errors"]]
+            )
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
+
+# Declared before /customers/{customer_id}, which would otherwise match "search".
+@app.get("/customers/search", response_model=List[CustomerResponse])
+async def search_customers(
+    q: str = Query(..., min_length=3),
+    limit: int = Query(20, gt=0, le=100),
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        customers = await customer_client.search(q, limit)
+        with timed("render"):
+            return [CustomerResponse(**customer) for customer in customers]
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
+
 @app.get("/customers/{customer_id}", response_model=CustomerResponse)
 async def get_customer(customer_id: str, current_user: str = Depends(get_current_user)):
     try:
-        response = customer_client.get(id=customer_id)
-        return CustomerResponse(
-            id=response["id"],
-            name=response["name"],
-            email=response["email"],
-            created_at=response["created_at"]
-        )
+        response = await customer_client.get(id=customer_id)
+        with timed("render"):
+            return CustomerResponse(
+                id=response["id"],
+                name=response["name"],
+                email=response["email"],
+                created_at=response["created_at"]
+            )
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        raise HTTPException(status_code=400, detail=e.details())
+
+@app.get("/customers/{customer_id}/stats", response_model=CustomerStats)
+async def get_customer_stats(customer_id: str, current_user: str = Depends(get_current_user)):
+    try:
+        response = await order_client.get_customer_stats(customer_id)
+        with timed("render"):
+            return CustomerStats(**response)
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -108,84 +210,230 @@ async def get_customer(customer_id: str, current_user: str = Depends(get_current
 
 @app.get("/customers", response_model=List[CustomerResponse])
 async def list_customers(
+    http_response: Response,
     page: int = 1,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    count: Literal["none", "maintained", "exact"] = "none",
     current_user: str = Depends(get_current_user)
 ):
     try:
-        response = customer_client.list_customers(page=page, limit=limit)
-        return [
-            CustomerResponse(
-                id=customer["id"],
-                name=customer["name"],
-                email=customer["email"],
-                created_at=customer["created_at"]
-            ) for customer in response["customers"]
-        ]
+        response = await customer_client.list_customers(
+            page=page,
+            limit=limit,
+            cursor=cursor or "",
+            count_mode=COUNT_MODES[count]
+        )
+        if response["next_cursor"]:
+            http_response.headers["X-Next-Cursor"] = response["next_cursor"]
+        if response["total"] is not None:
+            http_response.headers["X-Total-Count"] = str(response["total"])
+        with timed("render"):
+            return [
+                CustomerResponse(
+                    id=customer["id"],
+                    name=customer["name"],
+                    email=customer["email"],
+                    created_at=customer["created_at"]
+                ) for customer in response["customers"]
+            ]
     except grpc.RpcError as e:
         raise HTTPException(status_code=400, detail=e.details())
 
 @app.post("/orders", response_model=OrderResponse)
 async def create_order(order: OrderCreate, current_user: str = Depends(get_current_user)):
     try:
-        response = order_client.create(
+        response = await order_client.create(
             customer_id=order.customer_id,
             product_name=order.product_name,
             price=order.price
         )
-        return OrderResponse(
-            id=response["id"],
-            customer_id=response["customer_id"],
-            product_name=response["product_name"],
-            price=response["price"],
-            created_at=response["created_at"]
-        )
+        with timed("render"):
+            return OrderResponse(
+                id=response["id"],
+                customer_id=response["customer_id"],
+                product_name=response["product_name"],
+                price=response["price"],
+                created_at=response["created_at"]
+            )
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail="Customer not found")
         raise HTTPException(status_code=400, detail=e.details())
 
-@app.get("/orders", response_model=List[OrderResponse])
+@app.post("/orders/batch", response_model=OrderBatchResponse)
+async def batch_create_orders(
+    orders: List[OrderCreate],
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        response = await order_client.batch_create(
+            [order.model_dump() for order in orders]
+        )
+        with timed("render"):
+            return OrderBatchResponse(
+                orders=[OrderResponse(**order) for order in response["orders"]],
+                errors=[BatchError(**error) for error in response["errors"]]
+            )
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
+
+@app.get("/orders/export")
+async def export_orders(
+    customer_id: Optional[str] = None,
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+    current_user: str = Depends(get_current_user)
+):
+    orders = order_client.export_orders(
+        customer_id=customer_id or "",
+        created_from=created_from or "",
+        created_to=created_to or ""
+    )
+    # Pull the first order before answering so that a bad filter or an
+    # unavailable backend still turns into a proper HTTP error.
+    try:
+        first = await orders.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
+
+    async def ndjson():
+        if first is None:
+            return
+        lines = [json.dumps(first, ensure_ascii=False)]
+        async for order in orders:
+            lines.append(json.dumps(order, ensure_ascii=False))
+            if len(lines) >= EXPORT_FLUSH_LINES:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+def customer_loader():
+    """Batches one request's customer lookups into BatchGetCustomers calls."""
+    return DataLoader(customer_client.batch_get, max_batch_size=CUSTOMER_BATCH_SIZE)
+
+def _order_customer(customer):
+    if customer is None:
+        return None
+    return OrderCustomer(name=customer["name"], email=customer["email"])
+
+# Unset fields are left out so that customer only appears when expanded.
+@app.get("/orders", response_model=List[ExpandedOrderResponse], response_model_exclude_unset=True)
 async def list_orders(
+    http_response: Response,
     page: int = Query(1, gt=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: Optional[str] = None,
+    count: Literal["none", "maintained", "exact"] = "none",
+    expand: Optional[Literal["customer"]] = None,
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
     current_user: str = Depends(get_current_user)
 ):
     try:
-        response = order_client.list_orders(page=page, limit=limit)
-        return [
-            OrderResponse(
-                id=order["id"],
-                customer_id=order["customer_id"],
-                product_name=order["product_name"],
-                price=order["price"],
-                created_at=order["created_at"]
-            ) for order in response["orders"]
-        ]
+        response = await order_client.list_orders(
+            page=page,
+            limit=limit,
+            cursor=cursor or "",
+            count_mode=COUNT_MODES[count],
+            created_from=created_from or "",
+            created_to=created_to or ""
+        )
+        if response["next_cursor"]:
+            http_response.headers["X-Next-Cursor"] = response["next_cursor"]
+        if response["total"] is not None:
+            http_response.headers["X-Total-Count"] = str(response["total"])
+        with timed("render"):
+            orders = [
+                ExpandedOrderResponse(
+                    id=order["id"],
+                    customer_id=order["customer_id"],
+                    product_name=order["product_name"],
+                    price=order["price"],
+                    created_at=order["created_at"]
+                ) for order in response["orders"]
+            ]
+        if expand == "customer":
+            # One BatchGetCustomers call for the whole page.
+            customers = await customer_loader().load_many([order.customer_id for order in orders])
+            with timed("render"):
+                for order, customer in zip(orders, customers):
+                    order.customer = _order_customer(customer)
+        return orders
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
+@app.get("/orders/archive", response_model=List[OrderResponse])
+async def list_archived_orders(
+    http_response: Response,
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        response = await order_client.list_archived_orders(
+            limit=limit,
+            cursor=cursor or "",
+            customer_id=customer_id or "",
+            created_from=created_from or "",
+            created_to=created_to or ""
+        )
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
+    if response["next_cursor"]:
+        http_response.headers["X-Next-Cursor"] = response["next_cursor"]
+    with timed("render"):
+        return [OrderResponse(**order) for order in response["orders"]]
+
 @app.get("/orders/{customer_id}", response_model=List[OrderResponse])
 async def get_customer_orders(
     customer_id: str,
+    http_response: Response,
+    page: int = Query(1, gt=0),
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[str] = None,
+    count: Literal["none", "maintained", "exact"] = "none",
     current_user: str = Depends(get_current_user)
 ):
     try:
-        response = order_client.list_orders(page=1, limit=1000)
-        customer_orders = [
-            order for order in response["orders"] 
-            if order["customer_id"] == customer_id
-        ]
-        return customer_orders
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        response = await order_client.list_customer_orders(
+            customer_id=customer_id,
+            page=page,
+            limit=limit,
+            cursor=cursor or "",
+            count_mode=COUNT_MODES[count]
+        )
+        if response["next_cursor"]:
+            http_response.headers["X-Next-Cursor"] = response["next_cursor"]
+        if response["total"] is not None:
+            http_response.headers["X-Total-Count"] = str(response["total"])
+        with timed("render"):
+            return [
+                OrderResponse(
+                    id=order["id"],
+                    customer_id=order["customer_id"],
+                    product_name=order["product_name"],
+                    price=order["price"],
+                    created_at=order["created_at"]
+                ) for order in response["orders"]
+            ]
+    except grpc.RpcError as e:
+        raise HTTPException(status_code=400, detail=e.details())
     
 
     
 @app.delete("/customers/{customer_id}")
 async def delete_customer(customer_id: str, current_user: str = Depends(get_current_user)):
     try:
-        response = customer_client.delete(id=customer_id)
+        response = await customer_client.delete(id=customer_id)
         return {"success": response["success"]}
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
@@ -195,11 +443,15 @@ async def delete_customer(customer_id: str, current_user: str = Depends(get_curr
 @app.delete("/orders/{order_id}")
 async def delete_order(order_id: str, current_user: str = Depends(get_current_user)):
     try:
-        response = order_client.delete(order_id)
+        response = await order_client.delete(order_id)
         return {"success": response["success"]}
     except grpc.RpcError as e:
         if e.code() == grpc.StatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail="Order not found")
         raise HTTPException(status_code=400, detail=e.details())
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
 app.mount("/", StaticFiles(directory="../frontend", html=True), name="frontend")
\ No newline at end of file
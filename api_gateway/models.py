@@ -33,4 +33,31 @@ class OrderResponse(BaseModel):
     customer_id: str
     product_name: str
     price: float
-    created_at: str
\ No newline at end of file
+    created_at: str
+
+class OrderCustomer(BaseModel):
+    name: str
+    email: str
+
+class ExpandedOrderResponse(OrderResponse):
+    # Only present with ?expand=customer; null if the customer is gone.
+    customer: Optional[OrderCustomer] = None
+
+class CustomerStats(BaseModel):
+    customer_id: str
+    order_count: int
+    total_spent: float
+    last_order_at: Optional[str] = None
+
+class BatchError(BaseModel):
+    index: int
+    code: str
+    message: str
+
+class CustomerBatchResponse(BaseModel):
+    customers: List[CustomerResponse]
+    errors: List[BatchError]
+
+class OrderBatchResponse(BaseModel):
+    orders: List[OrderResponse]
+    errors: List[BatchError]
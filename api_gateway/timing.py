@@ -0,0 +1,152 @@
+"""Per-request latency breakdown for the gateway.
+
+TimingMiddleware gives every request a set of phase timers. JWT auth,
+the calls made through TimedClient and the response build add their time
+to it. The result is sent back in a Server-Timing header and aggregated
+per route into histograms, whose percentiles /metrics reports.
+"""
+import contextvars
+import inspect
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from common.metrics import MetricsRegistry
+
+# Log-spaced bucket bounds from 0.1 ms to ~19 s, each 1.5x the previous,
+# fine enough to read percentiles off with a few percent of error.
+PHASE_BUCKETS = tuple(0.0001 * 1.5 ** i for i in range(31))
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Phases in the order they are reported. "gateway" is whatever is left of
+# total after the others, i.e. routing, validation and serialization.
+PHASES = ("auth", "customer", "order", "render", "gateway", "total")
+
+REGISTRY = MetricsRegistry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "gateway_request_phase_seconds",
+    "Time spent per request in each phase, by route.",
+    ("method", "route", "phase"),
+    PHASE_BUCKETS
+)
+REQUESTS = REGISTRY.counter(
+    "gateway_requests_total", "Requests served, by route and status.", ("method", "route", "status")
+)
+
+_phases = contextvars.ContextVar("gateway_phases", default=None)
+
+
+@contextmanager
+def timed(phase):
+    """Adds the time spent in the block to the current request's phase."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = _phases.get()
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+
+
+class TimedClient:
+    """Wraps a gRPC client so that the time of each call counts towards phase."""
+
+    def __init__(self, client, phase):
+        self._client = client
+        self._phase = phase
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        phase = self._phase
+        if inspect.isasyncgenfunction(attr):
+            async def stream(*args, **kwargs):
+                items = attr(*args, **kwargs)
+                while True:
+                    with timed(phase):
+                        try:
+                            item = await items.__anext__()
+                        except StopAsyncIteration:
+                            return
+                    yield item
+            return stream
+        if inspect.iscoroutinefunction(attr):
+            async def call(*args, **kwargs):
+                with timed(phase):
+                    return await attr(*args, **kwargs)
+            return call
+        return attr
+
+
+def _server_timing(phases):
+    return ", ".join(
+        f"{phase};dur={phases[phase] * 1000:.2f}" for phase in PHASES if phase in phases
+    )
+
+
+def _finish(phases, total):
+    phases["total"] = total
+    phases["gateway"] = max(
+        0.0, total - sum(seconds for phase, seconds in phases.items() if phase not in ("gateway", "total"))
+    )
+
+
+class TimingMiddleware:
+    """ASGI middleware that adds Server-Timing and records per-route phase times."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases = {}
+        _phases.set(phases)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Streaming responses start before their body is produced,
+                # so their header only covers the time to first byte.
+                _finish(phases, time.perf_counter() - started)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(phases).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Only API routes are recorded; static files would add a label
+            # per path.
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                _finish(phases, time.perf_counter() - started)
+                method = scope["method"]
+                REQUESTS.inc(method, route, str(status))
+                for phase, seconds in phases.items():
+                    PHASE_SECONDS.observe(seconds, method, route, phase)
+
+
+def _percentile_lines():
+    name = "gateway_request_phase_percentile_seconds"
+    lines = [
+        f"# HELP {name} Percentiles of gateway_request_phase_seconds, estimated in process.",
+        f"# TYPE {name} gauge",
+    ]
+    for method, route, phase in sorted(PHASE_SECONDS.labelsets()):
+        for q in PERCENTILES:
+            value = PHASE_SECONDS.quantile(q, method, route, phase)
+            lines.append(
+                f'{name}{{method="{method}",route="{route}",phase="{phase}",quantile="{q}"}} {value:.6f}'
+            )
+    return lines
+
+
+REGISTRY.register_collector(_percentile_lines)
@@ -0,0 +1 @@
+"""Benchmarks for the CRM services. See load_test.py for the full-stack run."""
@@ -0,0 +1,255 @@
+"""Throwaway PostgreSQL, service processes and seed data for the load test."""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import grpc
+import psycopg2
+from psycopg2 import sql
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+from common.db import POSTGRES_CONFIG
+
+# Seeded rows get deterministic ids and timestamps, so workloads can
+# address any of them by index without reading them back first.
+SEED_EPOCH = datetime(2025, 1, 1)
+CUSTOMER_ID_PREFIX = "00000000-0000-4000-8000-"
+ORDER_ID_PREFIX = "00000000-0000-4000-a000-"
+
+CUSTOMER_PORT = 50051
+ORDER_PORT = 50052
+
+
+def customer_id(index):
+    return f"{CUSTOMER_ID_PREFIX}{index:012d}"
+
+
+def order_id(index):
+    return f"{ORDER_ID_PREFIX}{index:012d}"
+
+
+def order_created_at(index):
+    """Order index 1 is the newest seeded order; each one after is a second older."""
+    return SEED_EPOCH - timedelta(seconds=index)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"process exited with code {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+
+class ThrowawayPostgres:
+    """A private PostgreSQL cluster in a temporary directory.
+
+    Needs initdb and pg_ctl, taken from bin_dir or else from PATH. The
+    cluster keeps PostgreSQL's default durability settings, so write
+    latencies stay comparable to a real server.
+    """
+
+    def __init__(self, bin_dir=None):
+        self.bin_dir = Path(bin_dir) if bin_dir else None
+        self.port = _free_port()
+        self.directory = None
+
+    def _bin(self, name):
+        if self.bin_dir is not None:
+            return str(self.bin_dir / name)
+        path = shutil.which(name)
+        if path is None:
+            raise RuntimeError(f"{name} not found; pass --postgres-bin or use --external-db")
+        return path
+
+    def start(self):
+        self.directory = Path(tempfile.mkdtemp(prefix="crm-bench-"))
+        data = self.directory / "data"
+        subprocess.run(
+            [self._bin("initdb"), "-D", str(data), "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        subprocess.run(
+            [
+                self._bin("pg_ctl"), "-D", str(data), "-l", str(self.directory / "postgres.log"), "-w",
+                "-o", f"-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1 -c max_connections=300",
+                "start"
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        return {"host": "127.0.0.1", "port": str(self.port), "dbname": "postgres", "user": "postgres", "password": ""}
+
+    def stop(self):
+        if self.directory is None:
+            return
+        subprocess.run(
+            [self._bin("pg_ctl"), "-D", str(self.directory / "data"), "-m", "fast", "-w", "stop"],
+            stdout=subprocess.DEVNULL
+        )
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+
+
+class ExternalDatabase:
+    """A fresh database on the server from POSTGRES_CONFIG, dropped on stop()."""
+
+    def __init__(self):
+        self.name = f"crm_bench_{os.getpid()}_{int(time.time())}"
+
+    def _admin(self):
+        conn = psycopg2.connect(**POSTGRES_CONFIG)
+        conn.autocommit = True
+        return conn
+
+    def start(self):
+        conn = self._admin()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(self.name)))
+        finally:
+            conn.close()
+        return {**POSTGRES_CONFIG, "dbname": self.name}
+
+    def stop(self):
+        conn = self._admin()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(self.name)))
+        finally:
+            conn.close()
+
+
+class Stack:
+    """CustomerService, OrderService and the gateway as child processes."""
+
+    def __init__(self, db_config, gateway_port=8000, server_mode="threads", log_dir=None):
+        self.db_config = db_config
+        self.gateway_port = gateway_port
+        self.server_mode = server_mode
+        self.log_dir = Path(log_dir or tempfile.mkdtemp(prefix="crm-bench-logs-"))
+        self.processes = []
+
+    def _env(self):
+        return {
+            **os.environ,
+            "POSTGRES_HOST": self.db_config["host"],
+            "POSTGRES_PORT": str(self.db_config["port"]),
+            "POSTGRES_DB": self.db_config["dbname"],
+            "POSTGRES_USER": self.db_config["user"],
+            "POSTGRES_PASSWORD": self.db_config["password"],
+            "GRPC_SERVER_MODE": self.server_mode,
+            # Leave the metrics ports to a dev stack that may be running.
+            "METRICS_PORT": "0",
+            "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY", "benchmark-secret"),
+            "PYTHONUNBUFFERED": "1",
+        }
+
+    def _spawn(self, name, args, cwd):
+        log = open(self.log_dir / f"{name}.log", "w")
+        process = subprocess.Popen(args, cwd=cwd, env=self._env(), stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append((process, log))
+        return process
+
+    def start(self, timeout=120):
+        # The order service's migrations reference customers, so it waits
+        # for the customer service to have created its table.
+        process = self._spawn("customer_service", [sys.executable, "customer_server.py"], ROOT / "customer_service")
+        _wait_for_port(CUSTOMER_PORT, timeout, process)
+        process = self._spawn("order_service", [sys.executable, "order_server.py"], ROOT / "order_service")
+        _wait_for_port(ORDER_PORT, timeout, process)
+        process = self._spawn(
+            "gateway",
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.gateway_port), "--log-level", "warning"],
+            ROOT / "api_gateway"
+        )
+        _wait_for_port(self.gateway_port, timeout, process)
+        for port in (CUSTOMER_PORT, ORDER_PORT):
+            with grpc.insecure_channel(f"localhost:{port}") as channel:
+                grpc.channel_ready_future(channel).result(timeout=timeout)
+
+    def stop(self):
+        for process, _ in reversed(self.processes):
+            process.terminate()
+        for process, log in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        self.processes = []
+
+
+def seed(db_config, customers, orders, chunk_size=500_000, progress=print):
+    """Bulk-inserts the benchmark data set with generate_series.
+
+    Orders are spread evenly over customers, and created_at follows the
+    index, so the nth newest seeded order is order_id(n).
+    """
+    conn = psycopg2.connect(**db_config)
+    try:
+        # Creates the monthly partitions up front, so that the orders do not
+        # all land in orders_default.
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT orders_ensure_partitions(%s, %s)",
+                (order_created_at(orders).date(), SEED_EPOCH.date())
+            )
+        conn.commit()
+        for table, total, query in (
+            ("customers", customers, '''
+                INSERT INTO customers (id, name, email, created_at)
+                SELECT %(customer_prefix)s || lpad(i::text, 12, '0'),
+                       'Customer ' || i,
+                       'customer' || i || '@bench.example.com',
+                       %(epoch)s - i * interval '1 second'
+                FROM generate_series(%(start)s, %(stop)s) AS i
+            '''),
+            ("orders", orders, '''
+                INSERT INTO orders (id, customer_id, product_name, price, created_at)
+                SELECT %(order_prefix)s || lpad(i::text, 12, '0'),
+                       %(customer_prefix)s || lpad((1 + (i - 1) %% %(customers)s)::text, 12, '0'),
+                       'Product ' || (i %% 1000),
+                       round((1 + random() * 999)::numeric, 2),
+                       %(epoch)s - i * interval '1 second'
+                FROM generate_series(%(start)s, %(stop)s) AS i
+            '''),
+        ):
+            started = time.monotonic()
+            for start in range(1, total + 1, chunk_size):
+                stop = min(start + chunk_size - 1, total)
+                with conn.cursor() as cursor:
+                    cursor.execute(query, {
+                        "customer_prefix": CUSTOMER_ID_PREFIX,
+                        "order_prefix": ORDER_ID_PREFIX,
+                        "epoch": SEED_EPOCH,
+                        "customers": customers,
+                        "start": start,
+                        "stop": stop,
+                    })
+                conn.commit()
+                progress(f"{table}: {stop}/{total} ({stop / (time.monotonic() - started):,.0f} rows/s)")
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE customers")
+            cursor.execute("VACUUM ANALYZE orders")
+    finally:
+        conn.close()
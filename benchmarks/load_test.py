@@ -0,0 +1,155 @@
+"""Full-stack load test: services and gateway against a throwaway PostgreSQL.
+
+Seeds the data set, runs a weighted mix of operations and writes
+throughput and latency percentiles per operation to a JSON report. With
+--baseline the run is compared against an earlier report:
+
+    python -m benchmarks.load_test --customers 1000000 --orders 10000000 \\
+        --duration 120 --output after.json --baseline before.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from benchmarks.harness import ROOT, ExternalDatabase, Stack, ThrowawayPostgres, seed
+from benchmarks.workloads import DEFAULT_MIX, GatewayClient, GrpcClient, WorkloadState, parse_mix, run
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies, errors, seconds):
+    operations = {}
+    for name, values in latencies.items():
+        values = sorted(values)
+        operations[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "throughput_rps": len(values) / seconds if seconds else 0.0,
+            "mean_ms": sum(values) / len(values) * 1000 if values else None,
+            **{
+                f"p{int(q * 100)}_ms": _percentile(values, q) * 1000 if values else None
+                for q in (0.5, 0.95, 0.99)
+            },
+            "max_ms": values[-1] * 1000 if values else None,
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "operations": operations,
+        "total": {
+            "count": total,
+            "errors": sum(errors.values()),
+            "throughput_rps": total / seconds if seconds else 0.0,
+        },
+    }
+
+
+def _git_commit():
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def _change(new, old):
+    if new is None or not old:
+        return "      -"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def print_report(report, baseline=None):
+    print(f"{'operation':<20} {'count':>8} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in report["operations"].items():
+        print(
+            f"{name:<20} {result['count']:>8} {result['errors']:>5} {result['throughput_rps']:>9.1f} "
+            + " ".join(
+                f"{result[key]:>9.2f}" if result[key] is not None else f"{'-':>9}"
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+            )
+        )
+        if baseline is not None and name in baseline["operations"]:
+            old = baseline["operations"][name]
+            print(
+                f"{'  vs baseline':<20} {'':>8} {'':>5} {_change(result['throughput_rps'], old['throughput_rps']):>9} "
+                + " ".join(f"{_change(result[key], old[key]):>9}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+            )
+    total = report["total"]
+    print(f"{'total':<20} {total['count']:>8} {total['errors']:>5} {total['throughput_rps']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds run before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="weights such as get_customer=40,create_order=10 (default: built-in mix)")
+    parser.add_argument("--target", choices=["gateway", "grpc"], default="gateway",
+                        help="drive the HTTP gateway or the gRPC services directly")
+    parser.add_argument("--server-mode", choices=["threads", "aio"], default="threads")
+    parser.add_argument("--gateway-port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the operation mix")
+    parser.add_argument("--postgres-bin", help="directory with initdb and pg_ctl")
+    parser.add_argument("--external-db", action="store_true",
+                        help="create a scratch database on the POSTGRES_* server instead of running initdb")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    database = ExternalDatabase() if args.external_db else ThrowawayPostgres(args.postgres_bin)
+    db_config = database.start()
+    stack = Stack(db_config, gateway_port=args.gateway_port, server_mode=args.server_mode)
+    try:
+        print(f"Starting services (logs in {stack.log_dir})")
+        stack.start()
+        print(f"Seeding {args.customers} customers and {args.orders} orders")
+        seed(db_config, args.customers, args.orders)
+
+        state = WorkloadState(args.customers, args.orders)
+        if args.target == "gateway":
+            make_client = lambda: GatewayClient(port=args.gateway_port)
+        else:
+            make_client = GrpcClient
+        print(f"Running for {args.warmup:g}s warmup + {args.duration:g}s with {args.concurrency} workers")
+        latencies, errors, seconds = run(
+            make_client, state, args.mix, args.duration, args.warmup, args.concurrency, args.seed
+        )
+    finally:
+        stack.stop()
+        database.stop()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "target": args.target,
+            "server_mode": args.server_mode,
+            "customers": args.customers,
+            "orders": args.orders,
+            "duration": seconds,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        **summarize(latencies, errors, seconds),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
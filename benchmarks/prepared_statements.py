@@ -0,0 +1,127 @@
+"""Compares plain and prepared execution of the services' hot statements.
+
+Runs against the database in POSTGRES_CONFIG but only touches temporary
+tables, which shadow the real customers/orders tables for this session:
+
+    python prepared_statements.py --rows 100000 --iterations 5000
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+import psycopg2
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "customer_service"))
+sys.path.append(str(Path(__file__).parent.parent / "order_service"))
+from common.db import POSTGRES_CONFIG
+from common.statements import StatementRegistry
+from customer_repository import INSERT_CUSTOMER, LIST_CUSTOMERS, SELECT_CUSTOMER
+from order_repository import INSERT_ORDER, _orders_page_query
+
+
+def setup(conn, rows):
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            CREATE TEMP TABLE customers (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TEMP TABLE orders (
+                id TEXT PRIMARY KEY,
+                customer_id TEXT NOT NULL,
+                product_name TEXT NOT NULL,
+                price DECIMAL(10,2) NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO customers
+            SELECT 'c' || i, 'Customer ' || i, 'c' || i || '@example.com',
+                   now() - i * interval '1 second'
+            FROM generate_series(1, %s) AS i
+        ''', (rows,))
+        cursor.execute('''
+            INSERT INTO orders
+            SELECT 'o' || i, 'c' || (i %% %s + 1), 'Product ' || i, 10 + i %% 100,
+                   now() - i * interval '1 second'
+            FROM generate_series(1, %s) AS i
+        ''', (rows, rows * 5))
+        cursor.execute("CREATE INDEX ON customers (created_at DESC, id DESC)")
+        cursor.execute("CREATE INDEX ON orders (customer_id, created_at DESC)")
+        cursor.execute("CREATE INDEX ON orders (created_at DESC, id DESC)")
+        cursor.execute("ANALYZE customers")
+        cursor.execute("ANALYZE orders")
+    conn.commit()
+
+
+def workloads(rows):
+    now = datetime.now()
+    customer_ids = [f"c{i % rows + 1}" for i in range(0, 7919 * 50, 7919)]
+    page_after, page_after_params = _orders_page_query(20, after=(now - timedelta(seconds=rows), "o0"))
+    page_by_customer, _ = _orders_page_query(20, customer_id="c1")
+    return [
+        ("GetCustomer", SELECT_CUSTOMER, lambda i: (customer_ids[i % len(customer_ids)],)),
+        ("ListCustomers page 1", LIST_CUSTOMERS, lambda i: (20, 0)),
+        ("ListOrders keyset", page_after, lambda i: page_after_params),
+        ("ListCustomerOrders", page_by_customer, lambda i: (customer_ids[i % len(customer_ids)], 20, 0)),
+        ("CreateCustomer", INSERT_CUSTOMER,
+         lambda i: (str(uuid.uuid4()), "Bench", f"{uuid.uuid4()}@example.com", datetime.now())),
+        ("CreateOrder", INSERT_ORDER,
+         lambda i: (str(uuid.uuid4()), "c1", "Bench", 9.99, datetime.now())),
+    ]
+
+
+def measure(conn, run, iterations):
+    timings = []
+    with conn.cursor() as cursor:
+        for i in range(iterations):
+            started = time.perf_counter()
+            run(cursor, i)
+            if cursor.description is not None:
+                cursor.fetchall()
+            conn.commit()
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return {
+        "mean": statistics.fmean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95)],
+        "p99": timings[int(len(timings) * 0.99)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="customers to seed; orders get 5x")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**POSTGRES_CONFIG)
+    try:
+        setup(conn, args.rows)
+        registry = StatementRegistry()
+        print(f"{'statement':<22} {'mode':<9} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}   (µs)")
+        for label, statement, params in workloads(args.rows):
+            plain = measure(
+                conn, lambda cursor, i: cursor.execute(statement.sql, params(i)), args.iterations
+            )
+            prepared = measure(
+                conn, lambda cursor, i: registry.execute(cursor, statement, params(i)), args.iterations
+            )
+            for mode, result in (("plain", plain), ("prepared", prepared)):
+                print(f"{label:<22} {mode:<9} {result['mean']:>9.1f} {result['p50']:>9.1f} "
+                      f"{result['p95']:>9.1f} {result['p99']:>9.1f}")
+            print(f"{'':<22} speedup   {plain['mean'] / prepared['mean']:>8.2f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Operations of the mixed workload and the clients they run against."""
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "api_gateway"))
+from crm_pb2 import COUNT_NONE
+from common.pagination import encode_cursor
+from grpc_clients.customer import CustomerClient
+from grpc_clients.order import OrderClient
+from benchmarks.harness import CUSTOMER_PORT, ORDER_PORT, customer_id, order_created_at, order_id
+
+PAGE_SIZE = 20
+
+# Relative weights of each operation in the default mix.
+DEFAULT_MIX = {
+    "get_customer": 35,
+    "customer_orders": 20,
+    "list_orders_deep": 10,
+    "list_orders_keyset": 10,
+    "create_customer": 5,
+    "create_order": 10,
+    "delete_order": 5,
+    "delete_customer": 5,
+}
+
+
+class GatewayClient:
+    """Talks to the FastAPI gateway over one keep-alive HTTP connection."""
+
+    def __init__(self, port=8000, host="127.0.0.1"):
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+        self.headers = {"Content-Type": "application/json"}
+        token = self._request("POST", "/login", {"username": "benchmark", "password": "benchmark"})
+        self.headers["Authorization"] = f"Bearer {token['access_token']}"
+
+    def _request(self, method, path, body=None):
+        self.conn.request(method, path, json.dumps(body) if body is not None else None, self.headers)
+        response = self.conn.getresponse()
+        payload = response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path}: HTTP {response.status} {payload[:200]!r}")
+        return json.loads(payload) if payload else None
+
+    def create_customer(self, name, email):
+        return self._request("POST", "/customers", {"name": name, "email": email})["id"]
+
+    def get_customer(self, id):
+        return self._request("GET", f"/customers/{id}")
+
+    def list_orders(self, page, limit, cursor=""):
+        path = f"/orders?limit={limit}&" + (f"cursor={cursor}" if cursor else f"page={page}")
+        return self._request("GET", path)
+
+    def customer_orders(self, customer_id, limit):
+        return self._request("GET", f"/orders/{customer_id}?limit={limit}")
+
+    def create_order(self, customer_id, product_name, price):
+        body = {"customer_id": customer_id, "product_name": product_name, "price": price}
+        return self._request("POST", "/orders", body)["id"]
+
+    def delete_order(self, id):
+        return self._request("DELETE", f"/orders/{id}")
+
+    def delete_customer(self, id):
+        return self._request("DELETE", f"/customers/{id}")
+
+
+class GrpcClient:
+    """Calls the services directly, bypassing the gateway."""
+
+    def __init__(self):
+        self.customers = CustomerClient(port=CUSTOMER_PORT)
+        self.orders = OrderClient(port=ORDER_PORT)
+
+    def create_customer(self, name, email):
+        return self.customers.create(name=name, email=email)["id"]
+
+    def get_customer(self, id):
+        return self.customers.get(id=id)
+
+    def list_orders(self, page, limit, cursor=""):
+        return self.orders.list_orders(page=page, limit=limit, cursor=cursor, count_mode=COUNT_NONE)
+
+    def customer_orders(self, customer_id, limit):
+        return self.orders.list_customer_orders(
+            customer_id=customer_id, page=1, limit=limit, count_mode=COUNT_NONE
+        )
+
+    def create_order(self, customer_id, product_name, price):
+        return self.orders.create(customer_id=customer_id, product_name=product_name, price=price)["id"]
+
+    def delete_order(self, id):
+        return self.orders.delete(id)
+
+    def delete_customer(self, id):
+        return self.customers.delete(id=id)
+
+
+class WorkloadState:
+    """Seeded data set sizes plus the rows created during the run."""
+
+    def __init__(self, customers, orders):
+        self.customers = customers
+        self.orders = orders
+        self.created_customers = deque()
+        self.created_orders = deque()
+
+    def random_customer(self, rng):
+        return customer_id(rng.randint(1, self.customers))
+
+
+def _new_customer(client, state):
+    return client.create_customer("Benchmark", f"bench-{uuid.uuid4().hex}@example.com")
+
+
+def create_customer(client, rng, state):
+    state.created_customers.append(_new_customer(client, state))
+
+
+def get_customer(client, rng, state):
+    client.get_customer(state.random_customer(rng))
+
+
+def list_orders_deep(client, rng, state):
+    # OFFSET paging somewhere in the oldest 10% of the orders.
+    pages = max(1, state.orders // PAGE_SIZE)
+    client.list_orders(page=rng.randint(max(1, int(pages * 0.9)), pages), limit=PAGE_SIZE)
+
+
+def list_orders_keyset(client, rng, state):
+    # The same depth as list_orders_deep, reached through a cursor.
+    position = rng.randint(max(1, int(state.orders * 0.9)), max(1, state.orders - PAGE_SIZE))
+    cursor = encode_cursor(order_created_at(position), order_id(position))
+    client.list_orders(page=1, limit=PAGE_SIZE, cursor=cursor)
+
+
+def customer_orders(client, rng, state):
+    client.customer_orders(state.random_customer(rng), limit=PAGE_SIZE)
+
+
+def create_order(client, rng, state):
+    order = client.create_order(state.random_customer(rng), "Benchmark product", round(rng.uniform(1, 1000), 2))
+    state.created_orders.append(order)
+
+
+# Deletes only remove rows the run created, so the seeded data set stays
+# intact for reads. Each returns the id to delete, creating one untimed
+# if the run has not created any yet.
+def _pop(queue):
+    try:
+        return queue.popleft()
+    except IndexError:
+        return None
+
+
+def prepare_delete_order(client, rng, state):
+    return _pop(state.created_orders) or client.create_order(state.random_customer(rng), "Benchmark product", 1.0)
+
+
+def delete_order(client, rng, state, id):
+    client.delete_order(id)
+
+
+def prepare_delete_customer(client, rng, state):
+    return _pop(state.created_customers) or _new_customer(client, state)
+
+
+def delete_customer(client, rng, state, id):
+    client.delete_customer(id)
+
+
+# name -> (operation, untimed setup or None)
+OPERATIONS = {
+    "create_customer": (create_customer, None),
+    "get_customer": (get_customer, None),
+    "list_orders_deep": (list_orders_deep, None),
+    "list_orders_keyset": (list_orders_keyset, None),
+    "customer_orders": (customer_orders, None),
+    "create_order": (create_order, None),
+    "delete_order": (delete_order, prepare_delete_order),
+    "delete_customer": (delete_customer, prepare_delete_customer),
+}
+
+
+def parse_mix(text):
+    """Parses "get_customer=40,create_order=10" into a weight dict."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def run(make_client, state, mix, duration, warmup=0.0, concurrency=8, seed=0):
+    """Runs the mix from concurrency threads for warmup + duration seconds.
+
+    Returns ({operation: [latency seconds]}, {operation: error count},
+    measured seconds). Operations started during the warmup are not recorded.
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker(number):
+        client = make_client()
+        rng = random.Random(seed * 1000 + number)
+        own_latencies = {name: [] for name in names}
+        own_errors = {name: 0 for name in names}
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            operation, prepare = OPERATIONS[name]
+            try:
+                args = (prepare(client, rng, state),) if prepare is not None else ()
+                began = time.perf_counter()
+                operation(client, rng, state, *args)
+                elapsed = time.perf_counter() - began
+            except Exception:
+                if now >= measure_from:
+                    own_errors[name] += 1
+                continue
+            if now >= measure_from:
+                own_latencies[name].append(elapsed)
+        with lock:
+            for name in names:
+                latencies[name].extend(own_latencies[name])
+                errors[name] += own_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - measure_from
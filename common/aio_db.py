@@ -0,0 +1,74 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+from common.metrics import record_pool_wait, timed_query
+from common.statements import PreparedStatement
+
+# Sizing for the grpc.aio server mode. Without a thread per RPC the pool
+# is what bounds concurrency, so it can be much larger than the threaded
+# pool; requests beyond max_size wait up to timeout seconds for a slot.
+AIO_POOL_CONFIG = {
+    "min_size": int(os.getenv("POSTGRES_AIO_POOL_MIN", "2")),
+    "max_size": int(os.getenv("POSTGRES_AIO_POOL_MAX", "50")),
+    "timeout": float(os.getenv("POSTGRES_AIO_POOL_TIMEOUT", "30"))
+}
+
+
+class AsyncPostgresPool:
+    """psycopg 3 async pool with the same query helper as the sync services."""
+
+    def __init__(self, config, min_size=2, max_size=50, timeout=30.0):
+        self.pool = AsyncConnectionPool(
+            make_conninfo(**config),
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            open=False
+        )
+
+    async def open(self):
+        await self.pool.open(wait=True)
+
+    async def close(self):
+        await self.pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Checks out a connection; the block commits on success, else rolls back."""
+        started = time.perf_counter()
+        async with self.pool.connection() as conn:
+            record_pool_wait(time.perf_counter() - started)
+            yield conn
+
+    def stats(self):
+        stats = self.pool.get_stats()
+        return {
+            "size": stats.get("pool_size", 0),
+            "max_size": stats.get("pool_max", 0),
+            "idle": stats.get("pool_available", 0),
+            "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "checkouts": stats.get("requests_num", 0),
+            "timeouts": stats.get("requests_errors", 0),
+            "connections_created": stats.get("connections_num", 0),
+        }
+
+    async def execute(self, query, params=None, fetchone=False, fetchall=False):
+        # psycopg 3 prepares frequently executed queries on its own, so
+        # registered statements just contribute their SQL here.
+        if isinstance(query, PreparedStatement):
+            query = query.sql
+        async with self.connection() as conn:
+            async with conn.cursor() as cursor:
+                with timed_query() as timed:
+                    await cursor.execute(query, params or ())
+                    if fetchone:
+                        row = await cursor.fetchone()
+                        timed.rows = int(row is not None)
+                        return row
+                    if fetchall:
+                        rows = await cursor.fetchall()
+                        timed.rows = len(rows)
+                        return rows
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import deque
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from common.metrics import record_pool_wait
+
+POSTGRES_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+    "dbname": os.getenv("POSTGRES_DB", "crm_db"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "123456")
+}
+
+POOL_CONFIG = {
+    "minconn": int(os.getenv("POSTGRES_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("POSTGRES_POOL_MAX", "10")),
+    # Seconds get_conn() waits for a free connection before giving up.
+    "timeout": float(os.getenv("POSTGRES_POOL_TIMEOUT", "5")),
+    # Connections older than this are closed on return and replaced.
+    "max_age": float(os.getenv("POSTGRES_POOL_MAX_AGE", "1800")),
+    # Connections idle longer than this are pinged before being handed out.
+    "validate_idle": float(os.getenv("POSTGRES_POOL_VALIDATE_IDLE", "30"))
+}
+
+# Upper bounds (seconds) of the checkout wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolTimeoutError(PoolError):
+    """No connection became free within the pool's timeout."""
+
+
+class PostgresConnectionPool:
+    """Process-wide psycopg2 connection pool.
+
+    Unlike ThreadedConnectionPool, get_conn() blocks until a connection is
+    free, up to a timeout. Idle connections are checked before reuse and
+    are recycled once they reach max_age. stats() reports gauges and
+    counters for sizing the pool.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._init_pool(**POOL_CONFIG)
+        return cls._instance
+
+    def _init_pool(self, minconn, maxconn, timeout, max_age, validate_idle):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_age = max_age
+        self.validate_idle = validate_idle
+        self._cond = threading.Condition()
+        # (conn, created_at, returned_at); used as a stack so the most
+        # recently returned, warmest connection goes out first.
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.connections_created = 0
+        self.connections_recycled = 0
+        self.validation_failures = 0
+        for _ in range(minconn):
+            self._size += 1
+            conn = self._connect()
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**POSTGRES_CONFIG)
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self.connections_created += 1
+        return conn
+
+    def _discard(self, conn):
+        """Closes conn and frees its slot. Call without holding the lock."""
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._size -= 1
+            self._cond.notify()
+
+    def _is_usable(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if conn.closed or now - created_at >= self.max_age:
+            return False
+        if now - returned_at < self.validate_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self.validation_failures += 1
+            return False
+
+    def get_conn(self, timeout=None):
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        while True:
+            candidate = None
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeoutError(
+                            f"no free connection after {time.monotonic() - started:.3f}s "
+                            f"(pool size {self.maxconn})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+
+            # Validation and connecting happen outside the lock so that a
+            # slow network round trip does not stall other checkouts.
+            if candidate is not None:
+                conn, created_at, returned_at = candidate
+                if not self._is_usable(conn, created_at, returned_at):
+                    with self._cond:
+                        self.connections_recycled += 1
+                    self._discard(conn)
+                    continue
+            else:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            self._record_checkout(time.monotonic() - started)
+            return conn
+
+    def _record_checkout(self, waited):
+        record_pool_wait(waited)
+        with self._cond:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+
+    def put_conn(self, conn):
+        created_at = self._created_at.get(id(conn))
+        if created_at is None or conn.closed:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        if time.monotonic() - created_at >= self.max_age:
+            with self._cond:
+                self.connections_recycled += 1
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "max_size": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_buckets": dict(zip(WAIT_BUCKETS, self.wait_buckets)),
+                "connections_created": self.connections_created,
+                "connections_recycled": self.connections_recycled,
+                "validation_failures": self.validation_failures,
+            }
+
@@ -0,0 +1,86 @@
+"""Transport settings shared by the gRPC servers and the gateway's clients."""
+import itertools
+import os
+import grpc
+
+# Clients ping idle connections this often, so a connection dropped by a
+# NAT or load balancer is noticed and replaced before the next call.
+KEEPALIVE_TIME_MS = int(os.getenv("GRPC_KEEPALIVE_TIME_MS", "30000"))
+KEEPALIVE_TIMEOUT_MS = int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))
+# gRPC's default of 4 MiB is too small for large list pages.
+MAX_MESSAGE_BYTES = int(os.getenv("GRPC_MAX_MESSAGE_BYTES", str(16 * 1024 * 1024)))
+
+# "gzip" lets the services compress list and export responses of at least
+# COMPRESSION_MIN_BYTES; "none" sends them as they are.
+COMPRESSION = os.getenv("GRPC_COMPRESSION", "none")
+COMPRESSION_MIN_BYTES = int(os.getenv("GRPC_COMPRESSION_MIN_BYTES", "32768"))
+
+# Channels per service in a client's pool. One HTTP/2 connection carries
+# at most ~100 concurrent streams, so heavy fan-out needs several.
+CHANNEL_POOL_SIZE = int(os.getenv("GRPC_CHANNEL_POOL_SIZE", "4"))
+# Deadline in seconds of unary calls; 0 means none.
+CALL_TIMEOUT = float(os.getenv("GRPC_CALL_TIMEOUT", "10")) or None
+# Deadline of ExportOrders streams, which may run for minutes; 0 means none.
+EXPORT_TIMEOUT = float(os.getenv("GRPC_EXPORT_TIMEOUT", "0")) or None
+
+_MESSAGE_SIZE_OPTIONS = [
+    ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+]
+
+
+def server_options(reuse_port=False):
+    """Options for grpc.server(); reuse_port lets several processes bind the same port."""
+    return _MESSAGE_SIZE_OPTIONS + [
+        # Accept the clients' keepalive pings, including on idle
+        # connections, instead of answering them with GOAWAY.
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.min_ping_interval_without_data_ms", min(KEEPALIVE_TIME_MS, 300000)),
+        ("grpc.http2.max_ping_strikes", 0),
+        ("grpc.so_reuseport", int(reuse_port)),
+    ]
+
+
+def channel_options():
+    return _MESSAGE_SIZE_OPTIONS + [
+        ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+        ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Without this, channels with equal options share one subchannel
+        # and so one TCP connection, which would defeat the pool.
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+
+
+def compress_large(context, response):
+    """Asks for gzip on response if enabled and its encoded size is large enough."""
+    if COMPRESSION == "gzip" and response.ByteSize() >= COMPRESSION_MIN_BYTES:
+        context.set_compression(grpc.Compression.Gzip)
+    return response
+
+
+def compress_stream(context):
+    """Asks for gzip on a streaming response if enabled."""
+    if COMPRESSION == "gzip":
+        context.set_compression(grpc.Compression.Gzip)
+
+
+class ChannelPool:
+    """size channels to one target, each on its own connection, handed out round-robin."""
+
+    def __init__(self, target, stub_class, size=CHANNEL_POOL_SIZE, aio=False):
+        connect = grpc.aio.insecure_channel if aio else grpc.insecure_channel
+        self.channels = [connect(target, options=channel_options()) for _ in range(max(1, size))]
+        self._stubs = itertools.cycle([stub_class(channel) for channel in self.channels])
+
+    def stub(self):
+        return next(self._stubs)
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+
+    async def aclose(self):
+        for channel in self.channels:
+            await channel.close()
@@ -0,0 +1,337 @@
+"""In-process storage engine, selected with STORAGE_BACKEND=memory.
+
+It keeps the same orderings and constraints as the PostgreSQL schema:
+- customers and orders in sorted (created_at, id) indexes, for OFFSET
+  and keyset pages;
+- a per-customer order index, with a running total of the customer's
+  spend like the customer_order_stats table;
+- the same indexes over archived orders, like orders_archive;
+- a unique email index.
+The RPC and gateway layers can then be profiled, or run in CI, without a
+database.
+"""
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+from itertools import islice
+from crm_pb2 import COUNT_NONE
+from common.repository import CustomerRepository, DuplicateEmailError, OrderRepository, UnknownCustomerError
+
+
+class _SortedIndex:
+    """(created_at, id) keys in ascending order."""
+
+    def __init__(self):
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        bisect.insort(self.keys, key)
+
+    def remove(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def _range(self, created_from=None, created_to=None):
+        start = bisect.bisect_left(self.keys, (created_from,)) if created_from is not None else 0
+        end = bisect.bisect_left(self.keys, (created_to,)) if created_to is not None else len(self.keys)
+        return start, end
+
+    def count(self, created_from=None, created_to=None):
+        start, end = self._range(created_from, created_to)
+        return max(0, end - start)
+
+    def newest(self, limit, offset=0, after=None, created_from=None, created_to=None):
+        """Keys of a newest-first page, after the (created_at, id) key if given."""
+        start, end = self._range(created_from, created_to)
+        if after is not None:
+            end = min(end, bisect.bisect_left(self.keys, after))
+        else:
+            end -= offset
+        if end <= start:
+            return []
+        return self.keys[max(start, end - limit):end][::-1]
+
+    def oldest(self, limit, after_key=None, created_from=None, created_to=None):
+        """Keys of an oldest-first batch, resuming after after_key."""
+        if after_key is not None:
+            start = bisect.bisect_right(self.keys, after_key)
+        elif created_from is not None:
+            start = bisect.bisect_left(self.keys, (created_from,))
+        else:
+            start = 0
+        end = bisect.bisect_left(self.keys, (created_to,)) if created_to is not None else len(self.keys)
+        return self.keys[start:min(end, start + limit)]
+
+
+class MemoryStore:
+    """Customers and orders for one process, shared by the two repositories.
+
+    Each service runs in its own process with its own store. The order
+    service therefore cannot see customers and is given
+    check_customers=False, which skips the foreign key check. When both
+    repositories share a store, orders must reference an existing
+    customer and go away with it, as with the schema's ON DELETE CASCADE.
+    """
+
+    def __init__(self, check_customers=True):
+        self.check_customers = check_customers
+        self.lock = threading.RLock()
+        self.customers_by_id = {}
+        self.customer_ids_by_email = {}
+        self.customers_by_created = _SortedIndex()
+        self.orders_by_id = {}
+        self.orders_by_created = _SortedIndex()
+        self.orders_by_customer = defaultdict(_SortedIndex)
+        # Spend covers archived orders too, as in customer_order_stats.
+        self.spent_by_customer = defaultdict(float)
+        self.archived_by_id = {}
+        self.archived_by_created = _SortedIndex()
+        self.archived_by_customer = defaultdict(_SortedIndex)
+        self.customers = MemoryCustomerRepository(self)
+        self.orders = MemoryOrderRepository(self)
+
+    def customer_exists(self, customer_id):
+        return not self.check_customers or customer_id in self.customers_by_id
+
+    def insert_customer(self, row):
+        customer_id, _, email, created_at = row
+        if email in self.customer_ids_by_email:
+            raise DuplicateEmailError(f"email {email!r} already exists")
+        self.customers_by_id[customer_id] = row
+        self.customer_ids_by_email[email] = customer_id
+        self.customers_by_created.add((created_at, customer_id))
+
+    def insert_order(self, row):
+        order_id, customer_id, _, price, created_at = row
+        if not self.customer_exists(customer_id):
+            raise UnknownCustomerError(f"customer {customer_id!r} does not exist")
+        self.orders_by_id[order_id] = row
+        self.orders_by_created.add((created_at, order_id))
+        self.orders_by_customer[customer_id].add((created_at, order_id))
+        self.spent_by_customer[customer_id] += price
+
+    def delete_order(self, order_id):
+        row = self.orders_by_id.pop(order_id, None)
+        if row is None:
+            return
+        key = (row[4], order_id)
+        self.orders_by_created.remove(key)
+        by_customer = self.orders_by_customer.get(row[1])
+        if by_customer is not None:
+            by_customer.remove(key)
+            self.spent_by_customer[row[1]] -= row[3]
+            if not by_customer:
+                del self.orders_by_customer[row[1]]
+                if row[1] not in self.archived_by_customer:
+                    del self.spent_by_customer[row[1]]
+
+    def archive_order(self, order_id):
+        row = self.orders_by_id[order_id]
+        customer_id, price = row[1], row[3]
+        self.delete_order(order_id)
+        self.spent_by_customer[customer_id] += price
+        key = (row[4], order_id)
+        self.archived_by_id[order_id] = row
+        self.archived_by_created.add(key)
+        self.archived_by_customer[customer_id].add(key)
+
+    def delete_archived_orders(self, customer_id):
+        archived = self.archived_by_customer.pop(customer_id, None)
+        if archived is None:
+            return
+        for key in archived.keys:
+            del self.archived_by_id[key[1]]
+            self.archived_by_created.remove(key)
+        self.spent_by_customer.pop(customer_id, None)
+
+
+class MemoryCustomerRepository(CustomerRepository):
+    def __init__(self, store):
+        self.store = store
+
+    def create(self, customer_id, name, email, created_at):
+        with self.store.lock:
+            self.store.insert_customer((customer_id, name, email, created_at))
+
+    def get(self, customer_id):
+        return self.store.customers_by_id.get(customer_id)
+
+    def get_many(self, customer_ids):
+        customers_by_id = self.store.customers_by_id
+        return [customers_by_id[customer_id] for customer_id in customer_ids if customer_id in customers_by_id]
+
+    def search(self, query, limit):
+        # A full scan, ranked like the SQL query except that ties are
+        # broken by name instead of trigram similarity.
+        query = query.lower()
+        matches = []
+        with self.store.lock:
+            for row in self.store.customers_by_id.values():
+                fields = (row[1].lower(), row[2].lower())
+                if any(query == field for field in fields):
+                    rank = 0
+                elif any(field.startswith(query) for field in fields):
+                    rank = 1
+                elif any(query in field for field in fields):
+                    rank = 2
+                else:
+                    continue
+                matches.append((rank, row[1], row[0], row))
+        matches.sort(key=lambda match: match[:3])
+        return [match[3] for match in matches[:limit]]
+
+    def update(self, customer_id, name, email):
+        store = self.store
+        with store.lock:
+            row = store.customers_by_id.get(customer_id)
+            if row is None:
+                return
+            owner = store.customer_ids_by_email.get(email)
+            if owner is not None and owner != customer_id:
+                raise DuplicateEmailError(f"email {email!r} already exists")
+            del store.customer_ids_by_email[row[2]]
+            store.customer_ids_by_email[email] = customer_id
+            store.customers_by_id[customer_id] = (customer_id, name, email, row[3])
+
+    def delete(self, customer_id):
+        store = self.store
+        with store.lock:
+            row = store.customers_by_id.pop(customer_id, None)
+            if row is None:
+                return
+            del store.customer_ids_by_email[row[2]]
+            store.customers_by_created.remove((row[3], customer_id))
+            by_customer = store.orders_by_customer.get(customer_id)
+            if by_customer is not None:
+                for _, order_id in list(by_customer.keys):
+                    store.delete_order(order_id)
+            store.delete_archived_orders(customer_id)
+
+    def list(self, limit, offset=0, after=None):
+        store = self.store
+        with store.lock:
+            keys = store.customers_by_created.newest(limit, offset, after)
+            return [store.customers_by_id[customer_id] for _, customer_id in keys]
+
+    def count(self, count_mode):
+        if count_mode == COUNT_NONE:
+            return None
+        return len(self.store.customers_by_id)
+
+    def batch_create(self, rows):
+        inserted = set()
+        with self.store.lock:
+            for row in rows:
+                try:
+                    self.store.insert_customer(tuple(row))
+                except DuplicateEmailError:
+                    continue
+                inserted.add(row[0])
+        return inserted
+
+
+class MemoryOrderRepository(OrderRepository):
+    def __init__(self, store):
+        self.store = store
+
+    def create(self, order_id, customer_id, product_name, price, created_at):
+        with self.store.lock:
+            self.store.insert_order((order_id, customer_id, product_name, price, created_at))
+
+    def latest_for_customer(self, customer_id):
+        rows = self.list(1, customer_id=customer_id)
+        return rows[0] if rows else None
+
+    def _index(self, customer_id):
+        if customer_id is None:
+            return self.store.orders_by_created
+        return self.store.orders_by_customer.get(customer_id) or _SortedIndex()
+
+    def _archived_index(self, customer_id):
+        if customer_id is None:
+            return self.store.archived_by_created
+        return self.store.archived_by_customer.get(customer_id) or _SortedIndex()
+
+    def list(self, limit, offset=0, after=None, customer_id=None, created_from=None, created_to=None):
+        store = self.store
+        with store.lock:
+            keys = self._index(customer_id).newest(limit, offset, after, created_from, created_to)
+            return [store.orders_by_id[order_id] for _, order_id in keys]
+
+    def count(self, count_mode, customer_id=None, created_from=None, created_to=None):
+        if count_mode == COUNT_NONE:
+            return None
+        with self.store.lock:
+            return self._index(customer_id).count(created_from, created_to)
+
+    def stats(self, customer_id):
+        store = self.store
+        with store.lock:
+            if not store.customer_exists(customer_id):
+                return None
+            indexes = [
+                index for index in (
+                    store.orders_by_customer.get(customer_id),
+                    store.archived_by_customer.get(customer_id)
+                ) if index
+            ]
+            if not indexes:
+                return 0, 0.0, None
+            return (
+                sum(len(index) for index in indexes),
+                store.spent_by_customer[customer_id],
+                max(index.keys[-1][0] for index in indexes)
+            )
+
+    def delete(self, order_id):
+        with self.store.lock:
+            self.store.delete_order(order_id)
+
+    def batch_create(self, rows):
+        store = self.store
+        with store.lock:
+            known_customers = {row[1] for row in rows if store.customer_exists(row[1])}
+            for row in rows:
+                if row[1] in known_customers:
+                    store.insert_order(tuple(row))
+        return known_customers
+
+    def archive(self, cutoff, batch_size):
+        store = self.store
+        with store.lock:
+            keys = store.orders_by_created.oldest(batch_size, created_to=cutoff)
+            for _, order_id in keys:
+                store.archive_order(order_id)
+            return len(keys)
+
+    def list_archived(self, limit, after=None, customer_id=None, created_from=None, created_to=None):
+        store = self.store
+        with store.lock:
+            keys = self._archived_index(customer_id).newest(limit, 0, after, created_from, created_to)
+            return [store.archived_by_id[order_id] for _, order_id in keys]
+
+    def export(self, batch_size, customer_id=None, created_from=None, created_to=None):
+        store = self.store
+        last_key = None
+        while True:
+            # The lock is only held per batch, like a server-side cursor
+            # that lets writers in between fetches.
+            with store.lock:
+                # Archived orders are part of the history too.
+                keys = list(islice(heapq.merge(
+                    self._index(customer_id).oldest(batch_size, last_key, created_from, created_to),
+                    self._archived_index(customer_id).oldest(batch_size, last_key, created_from, created_to)
+                ), batch_size))
+                rows = [
+                    store.orders_by_id.get(order_id) or store.archived_by_id[order_id]
+                    for _, order_id in keys
+                ]
+            if not rows:
+                return
+            last_key = keys[-1]
+            yield from rows
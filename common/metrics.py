@@ -0,0 +1,437 @@
+"""Per-RPC metrics for the gRPC services in Prometheus text format.
+
+The server interceptors time every RPC and tag it with its status code.
+While an RPC runs, the pool and the query helpers add their pool wait,
+SQL time and fetched rows to it, so each RPC's latency can be split into
+gRPC, pool and database time.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import grpc
+
+# The endpoint is meant to be scraped from the same host or pod, so it
+# only listens on loopback unless told otherwise.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, value=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(zip(self.labelnames, labelvalues))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += 1
+            series[-1] += value
+
+    def labelsets(self):
+        with self._lock:
+            return list(self._values)
+
+    def quantile(self, q, *labelvalues):
+        """Estimates the q-quantile by interpolating within its bucket, like histogram_quantile()."""
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None or not series[-2]:
+                return None
+            counts = series[:-2]
+            rank = q * series[-2]
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        # The quantile is in the +Inf bucket; the top bound is all we know.
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._values.items()):
+                labels = list(zip(self.labelnames, labelvalues))
+                lines.extend(_histogram_lines(
+                    self.name, labels, zip(self.buckets, series), series[-2], series[-1]
+                ))
+        return lines
+
+
+def _histogram_lines(name, labels, bucket_counts, count, total):
+    """Renders non-cumulative bucket counts as a Prometheus histogram."""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in bucket_counts:
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_format_labels(labels + [('le', bound)])} {cumulative}")
+    lines.append(f"{name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return lines
+
+
+class MetricsRegistry:
+    """Holds metrics plus collectors that render other components' stats()."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """collector() is called on every scrape and returns text lines."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+RPC_HANDLED = REGISTRY.counter(
+    "grpc_server_handled_total", "RPCs completed, by status code.", ("service", "method", "code")
+)
+RPC_LATENCY = REGISTRY.histogram(
+    "grpc_server_handling_seconds", "Wall time from receiving an RPC to its last response.", ("service", "method")
+)
+RPC_DB_TIME = REGISTRY.histogram(
+    "grpc_server_db_seconds", "Time an RPC spent executing SQL and fetching rows.", ("service", "method")
+)
+RPC_POOL_WAIT = REGISTRY.histogram(
+    "grpc_server_pool_wait_seconds", "Time an RPC spent waiting for pooled connections.", ("service", "method")
+)
+RPC_QUERIES = REGISTRY.counter(
+    "grpc_server_db_queries_total", "SQL statements executed on behalf of RPCs.", ("service", "method")
+)
+RPC_ROWS = REGISTRY.counter(
+    "grpc_server_db_rows_total", "Rows fetched from PostgreSQL on behalf of RPCs.", ("service", "method")
+)
+
+
+class _Rpc:
+    __slots__ = ("service", "method", "started", "db_seconds", "pool_wait_seconds", "queries", "rows")
+
+    def __init__(self, full_method):
+        _, _, name = full_method.rpartition("/")
+        self.service = full_method[1:].partition("/")[0]
+        self.method = name
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+    def finish(self, code):
+        labels = (self.service, self.method)
+        RPC_HANDLED.inc(*labels, code.name)
+        RPC_LATENCY.observe(time.perf_counter() - self.started, *labels)
+        RPC_DB_TIME.observe(self.db_seconds, *labels)
+        RPC_POOL_WAIT.observe(self.pool_wait_seconds, *labels)
+        RPC_QUERIES.inc(*labels, value=self.queries)
+        RPC_ROWS.inc(*labels, value=self.rows)
+
+
+# The RPC being served. Thread pool workers and grpc.aio tasks each have
+# their own context, so concurrent RPCs never see each other's entry.
+_current_rpc = contextvars.ContextVar("current_rpc", default=None)
+
+
+def record_pool_wait(seconds):
+    rpc = _current_rpc.get()
+    if rpc is not None:
+        rpc.pool_wait_seconds += seconds
+
+
+class _QueryTimer:
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def timed_query():
+    """Times the block as SQL work of the current RPC; set .rows to the rows fetched."""
+    timer = _QueryTimer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        rpc = _current_rpc.get()
+        if rpc is not None:
+            rpc.db_seconds += time.perf_counter() - started
+            rpc.queries += 1
+            rpc.rows += timer.rows
+
+
+_STATUS_CODES = {code.value[0]: code for code in grpc.StatusCode}
+
+
+def _status_code(context, error):
+    if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+        return grpc.StatusCode.CANCELLED
+    code = context.code()
+    # grpc.aio reports the code set by abort() as a plain integer.
+    code = _STATUS_CODES.get(code, code)
+    if code is not None and code != grpc.StatusCode.OK:
+        return code
+    return grpc.StatusCode.UNKNOWN if error is not None else grpc.StatusCode.OK
+
+
+def _rebuild(handler, unary_unary=None, unary_stream=None):
+    if unary_unary is not None:
+        return grpc.unary_unary_rpc_method_handler(
+            unary_unary,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer
+        )
+    return grpc.unary_stream_rpc_method_handler(
+        unary_stream,
+        request_deserializer=handler.request_deserializer,
+        response_serializer=handler.response_serializer
+    )
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records count, status code and latency of every unary and server-streaming RPC."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        full_method = handler_call_details.method
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            def unary_unary(request, context):
+                rpc = _Rpc(full_method)
+                _current_rpc.set(rpc)
+                error = None
+                try:
+                    return behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    _current_rpc.set(None)
+                    rpc.finish(_status_code(context, error))
+            return _rebuild(handler, unary_unary=unary_unary)
+
+        if handler.unary_stream is not None:
+            behavior = handler.unary_stream
+
+            def unary_stream(request, context):
+                rpc = _Rpc(full_method)
+                _current_rpc.set(rpc)
+                error = None
+                try:
+                    yield from behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    _current_rpc.set(None)
+                    rpc.finish(_status_code(context, error))
+            return _rebuild(handler, unary_stream=unary_stream)
+
+        return handler
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of MetricsInterceptor."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        full_method = handler_call_details.method
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            async def unary_unary(request, context):
+                rpc = _Rpc(full_method)
+                _current_rpc.set(rpc)
+                error = None
+                try:
+                    return await behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    rpc.finish(_status_code(context, error))
+            return _rebuild(handler, unary_unary=unary_unary)
+
+        if handler.unary_stream is not None:
+            behavior = handler.unary_stream
+
+            async def unary_stream(request, context):
+                rpc = _Rpc(full_method)
+                _current_rpc.set(rpc)
+                error = None
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    rpc.finish(_status_code(context, error))
+            return _rebuild(handler, unary_stream=unary_stream)
+
+        return handler
+
+
+def pool_collector(pool, prefix="db_pool"):
+    """Renders a connection pool's stats() as gauges, counters and a wait histogram."""
+    gauges = ("size", "max_size", "idle", "in_use", "waiting")
+    counters = ("checkouts", "timeouts", "connections_created", "connections_recycled", "validation_failures")
+
+    def collect():
+        stats = pool.stats()
+        lines = []
+        for key in gauges:
+            if key in stats:
+                lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {stats[key]}"]
+        for key in counters:
+            if key in stats:
+                lines += [f"# TYPE {prefix}_{key}_total counter", f"{prefix}_{key}_total {stats[key]}"]
+        if "wait_buckets" in stats:
+            lines.append(f"# TYPE {prefix}_wait_seconds histogram")
+            lines.extend(_histogram_lines(
+                f"{prefix}_wait_seconds",
+                [],
+                stats["wait_buckets"].items(),
+                stats["checkouts"],
+                stats["wait_seconds_total"]
+            ))
+        return lines
+    return collect
+
+
+def cache_collector(cache, name):
+    """Renders an LRUCache's stats() labelled with the cache's name."""
+    def collect():
+        stats = cache.stats()
+        labels = _format_labels([("cache", name)])
+        lines = []
+        for key in ("hits", "misses", "evictions", "expirations"):
+            lines += [f"# TYPE cache_{key}_total counter", f"cache_{key}_total{labels} {stats[key]}"]
+        lines += ["# TYPE cache_size gauge", f"cache_size{labels} {stats['size']}"]
+        return lines
+    return collect
+
+
+def singleflight_collector(flights_by_client):
+    """Renders the stats() of SingleFlight groups, given as {client name: group}.
+
+    grpc_client_calls_total counts the calls sent to the backend and
+    grpc_client_coalesced_total the ones answered by a call in flight.
+    """
+    def collect():
+        calls, coalesced = [], []
+        for client, flights in sorted(flights_by_client.items()):
+            for method, counts in sorted(flights.stats().items()):
+                labels = _format_labels([("client", client), ("method", method)])
+                calls.append(f"grpc_client_calls_total{labels} {counts['executed']}")
+                coalesced.append(f"grpc_client_coalesced_total{labels} {counts['shared']}")
+        return [
+            "# TYPE grpc_client_calls_total counter", *calls,
+            "# TYPE grpc_client_coalesced_total counter", *coalesced,
+        ]
+    return collect
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """Serves GET /metrics from a daemon thread and returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,114 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Union
+
+# One lock for every component: the services share a database and some
+# objects (e.g. row_counts_apply), so their migrations must not interleave.
+_MIGRATIONS_LOCK_ID = 715_000
+# Seconds between attempts to take the lock while another process holds it.
+_LOCK_POLL_INTERVAL = 0.2
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A schema change applied once per database.
+
+    apply is either SQL text or a callable taking a cursor. Transactional
+    migrations commit together with their schema_migrations row; the rest
+    (e.g. CREATE INDEX CONCURRENTLY) run in autocommit mode and must be
+    idempotent, since a crash can leave them applied but not recorded.
+    """
+    version: int
+    name: str
+    apply: Union[str, Callable]
+    transactional: bool = True
+
+
+def create_index_concurrently(name, table, columns, method="btree"):
+    """Returns a migration step that builds an index without blocking writes.
+
+    A failed CONCURRENTLY build leaves an INVALID index behind that
+    IF NOT EXISTS would happily skip, so such leftovers are dropped first.
+    """
+    def apply(cursor):
+        cursor.execute(
+            '''SELECT NOT indisvalid FROM pg_index
+               WHERE indexrelid = to_regclass(%s)''',
+            (name,)
+        )
+        row = cursor.fetchone()
+        if row and row[0]:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING {method} ({columns})")
+    return apply
+
+
+def apply_migrations(conn, component, migrations):
+    """Applies the migrations of component that are not yet recorded."""
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        _acquire_lock(conn)
+        try:
+            _apply_pending(conn, component, migrations)
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATIONS_LOCK_ID,))
+    finally:
+        conn.autocommit = autocommit
+
+
+def _acquire_lock(conn):
+    # Polled rather than waited for in pg_advisory_lock: a backend blocked
+    # there keeps its snapshot, which a CREATE INDEX CONCURRENTLY run by
+    # the lock holder waits for, and the deadlock detector would abort
+    # one of the two starting processes.
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (_MIGRATIONS_LOCK_ID,))
+            if cursor.fetchone()[0]:
+                return
+            time.sleep(_LOCK_POLL_INTERVAL)
+
+
+def _apply_pending(conn, component, migrations):
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                component TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (component, version)
+            )
+        ''')
+        cursor.execute(
+            '''SELECT version FROM schema_migrations WHERE component = %s''',
+            (component,)
+        )
+        applied = {row[0] for row in cursor.fetchall()}
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        conn.autocommit = not migration.transactional
+        try:
+            with conn.cursor() as cursor:
+                if callable(migration.apply):
+                    migration.apply(cursor)
+                else:
+                    cursor.execute(migration.apply)
+                cursor.execute(
+                    '''INSERT INTO schema_migrations (component, version, name, applied_at)
+                       VALUES (%s, %s, %s, %s)''',
+                    (component, migration.version, migration.name, datetime.now())
+                )
+            if migration.transactional:
+                conn.commit()
+        except Exception:
+            if migration.transactional:
+                conn.rollback()
+            raise
+        print(f"Миграция {component}:{migration.version} ({migration.name}) применена")
@@ -0,0 +1,178 @@
+"""Storage interfaces for the services.
+
+The servicers go through a CustomerRepository and an OrderRepository
+instead of running SQL themselves, so the RPC layer runs unchanged
+against PostgreSQL or, with STORAGE_BACKEND=memory, against the
+in-process engine in common/memory.py.
+
+Rows are plain tuples in the column order of the tables:
+customers (id, name, email, created_at) and
+orders (id, customer_id, product_name, price, created_at).
+"""
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import errors
+from common.db import PostgresConnectionPool
+from common.metrics import timed_query
+from common.migrations import apply_migrations
+from common.statements import STATEMENTS, PreparedStatement
+
+# "postgres" or "memory", read once at startup.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres")
+
+
+class StorageError(Exception):
+    """The backend failed to read or write."""
+
+
+class DuplicateEmailError(StorageError):
+    """Another customer already has this email."""
+
+
+class UnknownCustomerError(StorageError):
+    """An order refers to a customer that does not exist."""
+
+
+class CustomerRepository(ABC):
+    @abstractmethod
+    def create(self, customer_id, name, email, created_at):
+        """Raises DuplicateEmailError if the email is taken."""
+
+    @abstractmethod
+    def get(self, customer_id):
+        """Returns the customer row, or None."""
+
+    @abstractmethod
+    def get_many(self, customer_ids):
+        """Returns the rows of the customers that exist, in no particular order."""
+
+    @abstractmethod
+    def search(self, query, limit):
+        """Returns up to limit customers whose name or email contains query, ignoring case, best matches first."""
+
+    @abstractmethod
+    def update(self, customer_id, name, email):
+        pass
+
+    @abstractmethod
+    def delete(self, customer_id):
+        """Deletes the customer together with its orders."""
+
+    @abstractmethod
+    def list(self, limit, offset=0, after=None):
+        """Returns a page, newest first. after is the (created_at, id) of the previous page's last row."""
+
+    @abstractmethod
+    def count(self, count_mode):
+        """Returns the number of customers, or None for COUNT_NONE."""
+
+    @abstractmethod
+    def batch_create(self, rows):
+        """Inserts rows, skipping taken emails, and returns the ids inserted."""
+
+
+class OrderRepository(ABC):
+    @abstractmethod
+    def create(self, order_id, customer_id, product_name, price, created_at):
+        """Raises UnknownCustomerError if the customer does not exist."""
+
+    @abstractmethod
+    def latest_for_customer(self, customer_id):
+        """Returns the customer's newest order row, or None."""
+
+    @abstractmethod
+    def list(self, limit, offset=0, after=None, customer_id=None, created_from=None, created_to=None):
+        """Returns a page, newest first, optionally of one customer's orders.
+
+        created_from and created_to bound created_at like in export().
+        """
+
+    @abstractmethod
+    def count(self, count_mode, customer_id=None, created_from=None, created_to=None):
+        """Returns the number of matching orders, or None for COUNT_NONE."""
+
+    @abstractmethod
+    def stats(self, customer_id):
+        """Returns (order_count, total_spent, last_order_at), or None for an unknown customer."""
+
+    @abstractmethod
+    def delete(self, order_id):
+        pass
+
+    @abstractmethod
+    def batch_create(self, rows):
+        """Inserts the rows whose customer exists and returns the set of existing customer ids."""
+
+    @abstractmethod
+    def archive(self, cutoff, batch_size):
+        """Moves up to batch_size of the oldest orders created before cutoff to the archive.
+
+        Runs as one short transaction and returns how many orders moved.
+        """
+
+    @abstractmethod
+    def list_archived(self, limit, after=None, customer_id=None, created_from=None, created_to=None):
+        """Returns a newest-first page of archived orders, after the (created_at, id) key if given."""
+
+    @abstractmethod
+    def export(self, batch_size, customer_id=None, created_from=None, created_to=None):
+        """Yields matching order rows, archived ones included, oldest first, reading batch_size rows at a time.
+
+        created_from is inclusive and created_to exclusive. Close the
+        generator to stop early.
+        """
+
+
+@contextmanager
+def translate_errors():
+    """Re-raises psycopg2 errors as StorageError subclasses."""
+    try:
+        yield
+    except errors.UniqueViolation as e:
+        raise DuplicateEmailError(str(e)) from e
+    except errors.ForeignKeyViolation as e:
+        raise UnknownCustomerError(str(e)) from e
+    except psycopg2.Error as e:
+        raise StorageError(str(e)) from e
+
+
+class PostgresRepository:
+    """Base of the PostgreSQL repositories: runs migrations and queries over the shared pool."""
+
+    def __init__(self, component, migrations):
+        self.pool = PostgresConnectionPool()
+        conn = self.pool.get_conn()
+        try:
+            apply_migrations(conn, component, migrations)
+        finally:
+            self.pool.put_conn(conn)
+
+    def _checkout(self):
+        """Takes a pooled connection; pool timeouts and failed connects raise StorageError."""
+        with translate_errors():
+            return self.pool.get_conn()
+
+    def _execute_query(self, query, params=None, fetchone=False, fetchall=False):
+        conn = self._checkout()
+        try:
+            with translate_errors(), conn.cursor() as cursor, timed_query() as timed:
+                if isinstance(query, PreparedStatement):
+                    STATEMENTS.execute(cursor, query, params or ())
+                else:
+                    cursor.execute(query, params or ())
+                if fetchone:
+                    row = cursor.fetchone()
+                    timed.rows = int(row is not None)
+                    return row
+                if fetchall:
+                    rows = cursor.fetchall()
+                    timed.rows = len(rows)
+                    return rows
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self.pool.put_conn(conn)
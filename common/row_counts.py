@@ -0,0 +1,85 @@
+from crm_pb2 import COUNT_MAINTAINED, COUNT_NONE
+from common.statements import STATEMENTS
+
+# Row counts are kept in row_counts by statement-level triggers that use
+# transition tables, so one trigger call covers a whole multi-row INSERT,
+# DELETE or ON DELETE CASCADE. The counter row is updated in the writer's
+# own transaction, so it is always exact for whoever reads it.
+_ROW_COUNTS_DDL = '''
+    CREATE TABLE IF NOT EXISTS row_counts (
+        table_name TEXT PRIMARY KEY,
+        row_count BIGINT NOT NULL
+    );
+
+    CREATE OR REPLACE FUNCTION row_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE row_counts SET row_count = row_count + (SELECT COUNT(*) FROM new_rows)
+            WHERE table_name = TG_TABLE_NAME;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE row_counts SET row_count = row_count - (SELECT COUNT(*) FROM old_rows)
+            WHERE table_name = TG_TABLE_NAME;
+        ELSE
+            UPDATE row_counts SET row_count = 0 WHERE table_name = TG_TABLE_NAME;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+_TRIGGERS_DDL = '''
+    DROP TRIGGER IF EXISTS {table}_count_insert ON {table};
+    CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_apply();
+
+    DROP TRIGGER IF EXISTS {table}_count_delete ON {table};
+    CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_apply();
+
+    DROP TRIGGER IF EXISTS {table}_count_truncate ON {table};
+    CREATE TRIGGER {table}_count_truncate AFTER TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION row_counts_apply();
+'''
+
+# Both services install their counters against the same database at
+# startup; the advisory lock keeps CREATE OR REPLACE FUNCTION from racing.
+_INSTALL_LOCK_ID = 715_001
+
+
+SELECT_ROW_COUNT = STATEMENTS.statement(
+    "select_row_count",
+    "SELECT row_count FROM row_counts WHERE table_name = %s"
+)
+
+
+def install_row_counter(cursor, table):
+    """Creates the counter triggers for table and seeds its row count.
+
+    Must run inside the caller's transaction: CREATE TRIGGER holds a lock
+    that blocks writers until commit, so the seed COUNT(*) cannot miss a
+    concurrent insert. The seed only runs the first time a table is seen.
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_INSTALL_LOCK_ID,))
+    cursor.execute(_ROW_COUNTS_DDL)
+    cursor.execute(_TRIGGERS_DDL.format(table=table))
+    cursor.execute(
+        f'''INSERT INTO row_counts (table_name, row_count)
+            SELECT %s, COUNT(*) FROM {table}
+            ON CONFLICT (table_name) DO NOTHING''',
+        (table,)
+    )
+
+
+def total_query(table, count_mode, where="", params=()):
+    """Returns (sql, params) for the requested total, or None for COUNT_NONE.
+
+    COUNT_MAINTAINED reads the trigger-maintained counter and only applies
+    to whole tables; filtered totals fall back to an exact COUNT(*).
+    """
+    if count_mode == COUNT_NONE:
+        return None
+    if count_mode == COUNT_MAINTAINED and not where:
+        return SELECT_ROW_COUNT, (table,)
+    return f"SELECT COUNT(*) FROM {table} {where}", tuple(params)
@@ -0,0 +1,65 @@
+import os
+import re
+import threading
+import weakref
+
+# Disable when running behind a transaction-pooling proxy such as
+# PgBouncer, where a session-level PREPARE may land on another backend.
+PREPARED_STATEMENTS_ENABLED = os.getenv("POSTGRES_PREPARED_STATEMENTS", "1") == "1"
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class PreparedStatement:
+    """A named query that is PREPAREd once per connection and then EXECUTEd.
+
+    sql keeps the original %s form, so drivers that prepare on their own
+    (psycopg 3) and callers with the feature disabled can run it as is.
+    """
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        counter = iter(range(1, sql.count("%s") + 1))
+        self.prepare_sql = f"PREPARE {name} AS " + _PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+
+    def __repr__(self):
+        return f"PreparedStatement({self.name!r})"
+
+
+class StatementRegistry:
+    """Keeps track of which statements each psycopg2 connection has prepared."""
+
+    def __init__(self):
+        self._statements = {}
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def statement(self, name, sql):
+        with self._lock:
+            statement = self._statements.get(name)
+            if statement is None:
+                statement = self._statements[name] = PreparedStatement(name, sql)
+            elif statement.sql != sql:
+                raise ValueError(f"statement {name!r} is already registered with different SQL")
+            return statement
+
+    def execute(self, cursor, statement, params=()):
+        if not PREPARED_STATEMENTS_ENABLED:
+            cursor.execute(statement.sql, params)
+            return
+        conn = cursor.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        # Prepared statements belong to the session and survive rollbacks,
+        # so a name is only remembered once PREPARE itself succeeded.
+        if statement.name not in prepared:
+            cursor.execute(statement.prepare_sql)
+            prepared.add(statement.name)
+        if params:
+            cursor.execute(f"EXECUTE {statement.name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cursor.execute(f"EXECUTE {statement.name}")
+
+
+STATEMENTS = StatementRegistry()
@@ -0,0 +1,106 @@
+"""Multi-process serving: forked workers share the service port via SO_REUSEPORT.
+
+The kernel spreads incoming connections over the workers, so a service
+can use more than the one core the GIL allows a single process. Each
+worker builds its own servicer and therefore its own database pool.
+"""
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+# Worker processes per service; 0 starts one per CPU. With 1 the service
+# runs in the current process, as before.
+GRPC_WORKERS = int(os.getenv("GRPC_WORKERS", "1")) or os.cpu_count()
+
+# A worker that exits sooner than this after starting is considered to be
+# crash-looping and is restarted with a delay that doubles each time.
+MIN_WORKER_UPTIME = 10.0
+MAX_RESTART_DELAY = 30.0
+# Seconds stopped workers get to exit after SIGTERM before being killed.
+STOP_TIMEOUT = 10.0
+
+
+# Worker i of a service serves /metrics on METRICS_PORT + i * stride, so
+# the services' default ports (9101, 9102) never collide on one host.
+METRICS_PORT_STRIDE = 100
+
+
+def worker_metrics_port(port, index):
+    """Port of worker index's /metrics endpoint; 0 keeps it off."""
+    return port + index * METRICS_PORT_STRIDE if port else 0
+
+
+def _run_worker(target, index):
+    # The supervisor's handlers only set a flag; workers should just exit.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        target(index)
+    except KeyboardInterrupt:
+        pass
+
+
+def supervise(target, workers, name):
+    """Runs target(index) in workers forked processes and restarts those that exit.
+
+    Must be called before the process creates any gRPC server or channel,
+    since gRPC's core does not survive a fork. Returns after SIGTERM or
+    SIGINT, once the workers have stopped.
+    """
+    context = multiprocessing.get_context("fork")
+    processes = {}
+    restart_at = {}
+    delays = {}
+    stopping = False
+
+    def start(index):
+        process = context.Process(target=_run_worker, args=(target, index), name=f"{name} worker {index}")
+        process.start()
+        processes[index] = (process, time.monotonic())
+        print(f"{name}: воркер {index} запущен (pid {process.pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for index in range(workers):
+            start(index)
+        while not stopping:
+            now = time.monotonic()
+            timeout = min([1.0] + [max(0.0, at - now) for at in restart_at.values()])
+            sentinels = {process.sentinel: index for index, (process, _) in processes.items()}
+            for sentinel in wait(list(sentinels), timeout=timeout):
+                index = sentinels[sentinel]
+                process, started_at = processes.pop(index)
+                process.join()
+                if stopping:
+                    break
+                if time.monotonic() - started_at >= MIN_WORKER_UPTIME:
+                    delays[index] = 0.0
+                else:
+                    delays[index] = min(MAX_RESTART_DELAY, max(1.0, delays.get(index, 0.0) * 2))
+                restart_at[index] = time.monotonic() + delays[index]
+                print(
+                    f"{name}: воркер {index} (pid {process.pid}) завершился с кодом {process.exitcode}, "
+                    f"перезапуск через {delays[index]:g} с"
+                )
+            now = time.monotonic()
+            for index, at in list(restart_at.items()):
+                if at <= now and not stopping:
+                    del restart_at[index]
+                    start(index)
+    finally:
+        for process, _ in processes.values():
+            process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process, _ in processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
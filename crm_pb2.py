@@ -24,13 +24,15 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tcrm.proto\x12\x03\x63rm\"4\n\x15\x43reateCustomerRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\" \n\x12GetCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\"@\n\x15UpdateCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"#\n\x15\x44\x65leteCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\")\n\x16\x44\x65leteCustomerResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\" \n\x12\x44\x65leteOrderRequest\x12\n\n\x02id\x18\x01 \x01(\t\"&\n\x13\x44\x65leteOrderResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"3\n\x14ListCustomersRequest\x12\x0c\n\x04page\x18\x01 \x01(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\"O\n\x10\x43ustomerResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x12\n\ncreated_at\x18\x04 \x01(\t\"P\n\x15ListCustomersResponse\x12(\n\tcustomers\x18\x01 \x03(\x0b\x32\x15.crm.CustomerResponse\x12\r\n\x05total\x18\x02 \x01(\x05\"N\n\x12\x43reateOrderRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\x12\x14\n\x0cproduct_name\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\".\n\x17GetCustomerOrderRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\"i\n\rOrderResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x13\n\x0b\x63ustomer_id\x18\x02 \x01(\t\x12\x14\n\x0cproduct_name\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x12\n\ncreated_at\x18\x05 \x01(\t\"0\n\x11ListOrdersRequest\x12\x0c\n\x04page\x18\x01 \x01(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\"G\n\x12ListOrdersResponse\x12\"\n\x06orders\x18\x01 \x03(\x0b\x32\x12.crm.OrderResponse\x12\r\n\x05total\x18\x02 \x01(\x05\x32\xed\x02\n\x0f\x43ustomerService\x12\x43\n\x0e\x43reateCustomer\x12\x1a.crm.CreateCustomerRequest\x1a\x15.crm.CustomerResponse\x12=\n\x0bGetCustomer\x12\x17.crm.GetCustomerRequest\x1a\x15.crm.CustomerResponse\x12\x43\n\x0eUpdateCustomer\x12\x1a.crm.UpdateCustomerRequest\x1a\x15.crm.CustomerResponse\x12I\n\x0e\x44\x65leteCustomer\x12\x1a.crm.DeleteCustomerRequest\x1a\x1b.crm.DeleteCustomerResponse\x12\x46\n\rListCustomers\x12\x19.crm.ListCustomersRequest\x1a\x1a.crm.ListCustomersResponse2\x91\x02\n\x0cOrderService\x12:\n\x0b\x43reateOrder\x12\x17.crm.CreateOrderRequest\x1a\x12.crm.OrderResponse\x12\x44\n\x10GetCustomerOrder\x12\x1c.crm.GetCustomerOrderRequest\x1a\x12.crm.OrderResponse\x12=\n\nListOrders\x12\x16.crm.ListOrdersRequest\x1a\x17.crm.ListOrdersResponse\x12@\n\x0b\x44\x65leteOrder\x12\x17.crm.DeleteOrderRequest\x1a\x18.crm.DeleteOrderResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tcrm.proto\x12\x03\x63rm\"4\n\x15\x43reateCustomerRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\" \n\x12GetCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\"@\n\x15UpdateCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"#\n\x15\x44\x65leteCustomerRequest\x12\n\n\x02id\x18\x01 \x01(\t\")\n\x16\x44\x65leteCustomerResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\" \n\x12\x44\x65leteOrderRequest\x12\n\n\x02id\x18\x01 \x01(\t\"&\n\x13\x44\x65leteOrderResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"g\n\x14ListCustomersRequest\x12\x0c\n\x04page\x18\x01 \x01(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\x12\"\n\ncount_mode\x18\x04 \x01(\x0e\x32\x0e.crm.CountMode\"O\n\x10\x43ustomerResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x12\n\ncreated_at\x18\x04 \x01(\t\"t\n\x15ListCustomersResponse\x12(\n\tcustomers\x18\x01 \x03(\x0b\x32\x15.crm.CustomerResponse\x12\x12\n\x05total\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12\x13\n\x0bnext_cursor\x18\x03 \x01(\tB\x08\n\x06_total\"N\n\x12\x43reateOrderRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\x12\x14\n\x0cproduct_name\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\".\n\x17GetCustomerOrderRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\"i\n\rOrderResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x13\n\x0b\x63ustomer_id\x18\x02 \x01(\t\x12\x14\n\x0cproduct_name\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x12\n\ncreated_at\x18\x05 \x01(\t\"\x8e\x01\n\x11ListOrdersRequest\x12\x0c\n\x04page\x18\x01 \x01(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\x12\"\n\ncount_mode\x18\x04 \x01(\x0e\x32\x0e.crm.CountMode\x12\x14\n\x0c\x63reated_from\x18\x05 \x01(\t\x12\x12\n\ncreated_to\x18\x06 \x01(\t\"\x81\x01\n\x19ListCustomerOrdersRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\x12\x0c\n\x04page\x18\x02 \x01(\x05\x12\r\n\x05limit\x18\x03 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x04 \x01(\t\x12\"\n\ncount_mode\x18\x05 \x01(\x0e\x32\x0e.crm.CountMode\"k\n\x12ListOrdersResponse\x12\"\n\x06orders\x18\x01 \x03(\x0b\x32\x12.crm.OrderResponse\x12\x12\n\x05total\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12\x13\n\x0bnext_cursor\x18\x03 \x01(\tB\x08\n\x06_total\">\n\x0e\x42\x61tchItemError\x12\r\n\x05index\x18\x01 \x01(\x05\x12\x0c\n\x04\x63ode\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"L\n\x1b\x42\x61tchCreateCustomersRequest\x12-\n\tcustomers\x18\x01 \x03(\x0b\x32\x1a.crm.CreateCustomerRequest\"m\n\x1c\x42\x61tchCreateCustomersResponse\x12(\n\tcustomers\x18\x01 \x03(\x0b\x32\x15.crm.CustomerResponse\x12#\n\x06\x65rrors\x18\x02 \x03(\x0b\x32\x13.crm.BatchItemError\"\'\n\x18\x42\x61tchGetCustomersRequest\x12\x0b\n\x03ids\x18\x01 \x03(\t\"E\n\x19\x42\x61tchGetCustomersResponse\x12(\n\tcustomers\x18\x01 \x03(\x0b\x32\x15.crm.CustomerResponse\"6\n\x16SearchCustomersRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"C\n\x17SearchCustomersResponse\x12(\n\tcustomers\x18\x01 \x03(\x0b\x32\x15.crm.CustomerResponse\"C\n\x18\x42\x61tchCreateOrdersRequest\x12\'\n\x06orders\x18\x01 \x03(\x0b\x32\x17.crm.CreateOrderRequest\"d\n\x19\x42\x61tchCreateOrdersResponse\x12\"\n\x06orders\x18\x01 \x03(\x0b\x32\x12.crm.OrderResponse\x12#\n\x06\x65rrors\x18\x02 \x03(\x0b\x32\x13.crm.BatchItemError\"T\n\x13\x45xportOrdersRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\x12\x14\n\x0c\x63reated_from\x18\x02 \x01(\t\x12\x12\n\ncreated_to\x18\x03 \x01(\t\".\n\x17GetCustomerStatsRequest\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\"m\n\x15\x43ustomerStatsResponse\x12\x13\n\x0b\x63ustomer_id\x18\x01 \x01(\t\x12\x13\n\x0border_count\x18\x02 \x01(\x03\x12\x13\n\x0btotal_spent\x18\x03 \x01(\x01\x12\x15\n\rlast_order_at\x18\x04 \x01(\t\"y\n\x19ListArchivedOrdersRequest\x12\r\n\x05limit\x18\x01 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\t\x12\x13\n\x0b\x63ustomer_id\x18\x03 \x01(\t\x12\x14\n\x0c\x63reated_from\x18\x04 \x01(\t\x12\x12\n\ncreated_to\x18\x05 \x01(\t*B\n\tCountMode\x12\x14\n\x10\x43OUNT_MAINTAINED\x10\x00\x12\x0f\n\x0b\x43OUNT_EXACT\x10\x01\x12\x0e\n\nCOUNT_NONE\x10\x02\x32\xec\x04\n\x0f\x43ustomerService\x12\x43\n\x0e\x43reateCustomer\x12\x1a.crm.CreateCustomerRequest\x1a\x15.crm.CustomerResponse\x12=\n\x0bGetCustomer\x12\x17.crm.GetCustomerRequest\x1a\x15.crm.CustomerResponse\x12\x43\n\x0eUpdateCustomer\x12\x1a.crm.UpdateCustomerRequest\x1a\x15.crm.CustomerResponse\x12I\n\x0e\x44\x65leteCustomer\x12\x1a.crm.DeleteCustomerRequest\x1a\x1b.crm.DeleteCustomerResponse\x12\x46\n\rListCustomers\x12\x19.crm.ListCustomersRequest\x1a\x1a.crm.ListCustomersResponse\x12[\n\x14\x42\x61tchCreateCustomers\x12 .crm.BatchCreateCustomersRequest\x1a!.crm.BatchCreateCustomersResponse\x12R\n\x11\x42\x61tchGetCustomers\x12\x1d.crm.BatchGetCustomersRequest\x1a\x1e.crm.BatchGetCustomersResponse\x12L\n\x0fSearchCustomers\x12\x1b.crm.SearchCustomersRequest\x1a\x1c.crm.SearchCustomersResponse2\x91\x05\n\x0cOrderService\x12:\n\x0b\x43reateOrder\x12\x17.crm.CreateOrderRequest\x1a\x12.crm.OrderResponse\x12\x44\n\x10GetCustomerOrder\x12\x1c.crm.GetCustomerOrderRequest\x1a\x12.crm.OrderResponse\x12=\n\nListOrders\x12\x16.crm.ListOrdersRequest\x1a\x17.crm.ListOrdersResponse\x12M\n\x12ListCustomerOrders\x12\x1e.crm.ListCustomerOrdersRequest\x1a\x17.crm.ListOrdersResponse\x12@\n\x0b\x44\x65leteOrder\x12\x17.crm.DeleteOrderRequest\x1a\x18.crm.DeleteOrderResponse\x12R\n\x11\x42\x61tchCreateOrders\x12\x1d.crm.BatchCreateOrdersRequest\x1a\x1e.crm.BatchCreateOrdersResponse\x12>\n\x0c\x45xportOrders\x12\x18.crm.ExportOrdersRequest\x1a\x12.crm.OrderResponse0\x01\x12L\n\x10GetCustomerStats\x12\x1c.crm.GetCustomerStatsRequest\x1a\x1a.crm.CustomerStatsResponse\x12M\n\x12ListArchivedOrders\x12\x1e.crm.ListArchivedOrdersRequest\x1a\x17.crm.ListOrdersResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'crm_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_COUNTMODE']._serialized_start=2280
+  _globals['_COUNTMODE']._serialized_end=2346
   _globals['_CREATECUSTOMERREQUEST']._serialized_start=18
   _globals['_CREATECUSTOMERREQUEST']._serialized_end=70
   _globals['_GETCUSTOMERREQUEST']._serialized_start=72
@@ -46,23 +48,51 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_DELETEORDERRESPONSE']._serialized_start=286
   _globals['_DELETEORDERRESPONSE']._serialized_end=324
   _globals['_LISTCUSTOMERSREQUEST']._serialized_start=326
-  _globals['_LISTCUSTOMERSREQUEST']._serialized_end=377
-  _globals['_CUSTOMERRESPONSE']._serialized_start=379
-  _globals['_CUSTOMERRESPONSE']._serialized_end=458
-  _globals['_LISTCUSTOMERSRESPONSE']._serialized_start=460
-  _globals['_LISTCUSTOMERSRESPONSE']._serialized_end=540
-  _globals['_CREATEORDERREQUEST']._serialized_start=542
-  _globals['_CREATEORDERREQUEST']._serialized_end=620
-  _globals['_GETCUSTOMERORDERREQUEST']._serialized_start=622
-  _globals['_GETCUSTOMERORDERREQUEST']._serialized_end=668
-  _globals['_ORDERRESPONSE']._serialized_start=670
-  _globals['_ORDERRESPONSE']._serialized_end=775
-  _globals['_LISTORDERSREQUEST']._serialized_start=777
-  _globals['_LISTORDERSREQUEST']._serialized_end=825
-  _globals['_LISTORDERSRESPONSE']._serialized_start=827
-  _globals['_LISTORDERSRESPONSE']._serialized_end=898
-  _globals['_CUSTOMERSERVICE']._serialized_start=901
-  _globals['_CUSTOMERSERVICE']._serialized_end=1266
-  _globals['_ORDERSERVICE']._serialized_start=1269
-  _globals['_ORDERSERVICE']._serialized_end=1542
+  _globals['_LISTCUSTOMERSREQUEST']._serialized_end=429
+  _globals['_CUSTOMERRESPONSE']._serialized_start=431
+  _globals['_CUSTOMERRESPONSE']._serialized_end=510
+  _globals['_LISTCUSTOMERSRESPONSE']._serialized_start=512
+  _globals['_LISTCUSTOMERSRESPONSE']._serialized_end=628
+  _globals['_CREATEORDERREQUEST']._serialized_start=630
+  _globals['_CREATEORDERREQUEST']._serialized_end=708
+  _globals['_GETCUSTOMERORDERREQUEST']._serialized_start=710
+  _globals['_GETCUSTOMERORDERREQUEST']._serialized_end=756
+  _globals['_ORDERRESPONSE']._serialized_start=758
+  _globals['_ORDERRESPONSE']._serialized_end=863
+  _globals['_LISTORDERSREQUEST']._serialized_start=866
+  _globals['_LISTORDERSREQUEST']._serialized_end=1008
+  _globals['_LISTCUSTOMERORDERSREQUEST']._serialized_start=1011
+  _globals['_LISTCUSTOMERORDERSREQUEST']._serialized_end=1140
+  _globals['_LISTORDERSRESPONSE']._serialized_start=1142
+  _globals['_LISTORDERSRESPONSE']._serialized_end=1249
+  _globals['_BATCHITEMERROR']._serialized_start=1251
+  _globals['_BATCHITEMERROR']._serialized_end=1313
+  _globals['_BATCHCREATECUSTOMERSREQUEST']._serialized_start=1315
+  _globals['_BATCHCREATECUSTOMERSREQUEST']._serialized_end=1391
+  _globals['_BATCHCREATECUSTOMERSRESPONSE']._serialized_start=1393
+  _globals['_BATCHCREATECUSTOMERSRESPONSE']._serialized_end=1502
+  _globals['_BATCHGETCUSTOMERSREQUEST']._serialized_start=1504
+  _globals['_BATCHGETCUSTOMERSREQUEST']._serialized_end=1543
+  _globals['_BATCHGETCUSTOMERSRESPONSE']._serialized_start=1545
+  _globals['_BATCHGETCUSTOMERSRESPONSE']._serialized_end=1614
+  _globals['_SEARCHCUSTOMERSREQUEST']._serialized_start=1616
+  _globals['_SEARCHCUSTOMERSREQUEST']._serialized_end=1670
+  _globals['_SEARCHCUSTOMERSRESPONSE']._serialized_start=1672
+  _globals['_SEARCHCUSTOMERSRESPONSE']._serialized_end=1739
+  _globals['_BATCHCREATEORDERSREQUEST']._serialized_start=1741
+  _globals['_BATCHCREATEORDERSREQUEST']._serialized_end=1808
+  _globals['_BATCHCREATEORDERSRESPONSE']._serialized_start=1810
+  _globals['_BATCHCREATEORDERSRESPONSE']._serialized_end=1910
+  _globals['_EXPORTORDERSREQUEST']._serialized_start=1912
+  _globals['_EXPORTORDERSREQUEST']._serialized_end=1996
+  _globals['_GETCUSTOMERSTATSREQUEST']._serialized_start=1998
+  _globals['_GETCUSTOMERSTATSREQUEST']._serialized_end=2044
+  _globals['_CUSTOMERSTATSRESPONSE']._serialized_start=2046
+  _globals['_CUSTOMERSTATSRESPONSE']._serialized_end=2155
+  _globals['_LISTARCHIVEDORDERSREQUEST']._serialized_start=2157
+  _globals['_LISTARCHIVEDORDERSREQUEST']._serialized_end=2278
+  _globals['_CUSTOMERSERVICE']._serialized_start=2349
+  _globals['_CUSTOMERSERVICE']._serialized_end=2969
+  _globals['_ORDERSERVICE']._serialized_start=2972
+  _globals['_ORDERSERVICE']._serialized_end=3629
 # @@protoc_insertion_point(module_scope)
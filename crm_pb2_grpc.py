@@ -59,6 +59,21 @@ class CustomerServiceStub(object):
                 request_serializer=crm__pb2.ListCustomersRequest.SerializeToString,
                 response_deserializer=crm__pb2.ListCustomersResponse.FromString,
                 _registered_method=True)
+        self.BatchCreateCustomers = channel.unary_unary(
+                '/crm.CustomerService/BatchCreateCustomers',
+                request_serializer=crm__pb2.BatchCreateCustomersRequest.SerializeToString,
+                response_deserializer=crm__pb2.BatchCreateCustomersResponse.FromString,
+                _registered_method=True)
+        self.BatchGetCustomers = channel.unary_unary(
+                '/crm.CustomerService/BatchGetCustomers',
+                request_serializer=crm__pb2.BatchGetCustomersRequest.SerializeToString,
+                response_deserializer=crm__pb2.BatchGetCustomersResponse.FromString,
+                _registered_method=True)
+        self.SearchCustomers = channel.unary_unary(
+                '/crm.CustomerService/SearchCustomers',
+                request_serializer=crm__pb2.SearchCustomersRequest.SerializeToString,
+                response_deserializer=crm__pb2.SearchCustomersResponse.FromString,
+                _registered_method=True)
 
 
 class CustomerServiceServicer(object):
@@ -94,6 +109,24 @@ class CustomerServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchCreateCustomers(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchGetCustomers(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SearchCustomers(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CustomerServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -122,6 +155,21 @@ def add_CustomerServiceServicer_to_server(servicer, server):
                     request_deserializer=crm__pb2.ListCustomersRequest.FromString,
                     response_serializer=crm__pb2.ListCustomersResponse.SerializeToString,
             ),
+            'BatchCreateCustomers': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchCreateCustomers,
+                    request_deserializer=crm__pb2.BatchCreateCustomersRequest.FromString,
+                    response_serializer=crm__pb2.BatchCreateCustomersResponse.SerializeToString,
+            ),
+            'BatchGetCustomers': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetCustomers,
+                    request_deserializer=crm__pb2.BatchGetCustomersRequest.FromString,
+                    response_serializer=crm__pb2.BatchGetCustomersResponse.SerializeToString,
+            ),
+            'SearchCustomers': grpc.unary_unary_rpc_method_handler(
+                    servicer.SearchCustomers,
+                    request_deserializer=crm__pb2.SearchCustomersRequest.FromString,
+                    response_serializer=crm__pb2.SearchCustomersResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'crm.CustomerService', rpc_method_handlers)
@@ -268,6 +316,87 @@ class CustomerService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def BatchCreateCustomers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.CustomerService/BatchCreateCustomers',
+            crm__pb2.BatchCreateCustomersRequest.SerializeToString,
+            crm__pb2.BatchCreateCustomersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchGetCustomers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.CustomerService/BatchGetCustomers',
+            crm__pb2.BatchGetCustomersRequest.SerializeToString,
+            crm__pb2.BatchGetCustomersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SearchCustomers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.CustomerService/SearchCustomers',
+            crm__pb2.SearchCustomersRequest.SerializeToString,
+            crm__pb2.SearchCustomersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class OrderServiceStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -293,11 +422,36 @@ class OrderServiceStub(object):
                 request_serializer=crm__pb2.ListOrdersRequest.SerializeToString,
                 response_deserializer=crm__pb2.ListOrdersResponse.FromString,
                 _registered_method=True)
+        self.ListCustomerOrders = channel.unary_unary(
+                '/crm.OrderService/ListCustomerOrders',
+                request_serializer=crm__pb2.ListCustomerOrdersRequest.SerializeToString,
+                response_deserializer=crm__pb2.ListOrdersResponse.FromString,
+                _registered_method=True)
         self.DeleteOrder = channel.unary_unary(
                 '/crm.OrderService/DeleteOrder',
                 request_serializer=crm__pb2.DeleteOrderRequest.SerializeToString,
                 response_deserializer=crm__pb2.DeleteOrderResponse.FromString,
                 _registered_method=True)
+        self.BatchCreateOrders = channel.unary_unary(
+                '/crm.OrderService/BatchCreateOrders',
+                request_serializer=crm__pb2.BatchCreateOrdersRequest.SerializeToString,
+                response_deserializer=crm__pb2.BatchCreateOrdersResponse.FromString,
+                _registered_method=True)
+        self.ExportOrders = channel.unary_stream(
+                '/crm.OrderService/ExportOrders',
+                request_serializer=crm__pb2.ExportOrdersRequest.SerializeToString,
+                response_deserializer=crm__pb2.OrderResponse.FromString,
+                _registered_method=True)
+        self.GetCustomerStats = channel.unary_unary(
+                '/crm.OrderService/GetCustomerStats',
+                request_serializer=crm__pb2.GetCustomerStatsRequest.SerializeToString,
+                response_deserializer=crm__pb2.CustomerStatsResponse.FromString,
+                _registered_method=True)
+        self.ListArchivedOrders = channel.unary_unary(
+                '/crm.OrderService/ListArchivedOrders',
+                request_serializer=crm__pb2.ListArchivedOrdersRequest.SerializeToString,
+                response_deserializer=crm__pb2.ListOrdersResponse.FromString,
+                _registered_method=True)
 
 
 class OrderServiceServicer(object):
@@ -321,12 +475,42 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListCustomerOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def DeleteOrder(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchCreateOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ExportOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetCustomerStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListArchivedOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -345,11 +529,36 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=crm__pb2.ListOrdersRequest.FromString,
                     response_serializer=crm__pb2.ListOrdersResponse.SerializeToString,
             ),
+            'ListCustomerOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListCustomerOrders,
+                    request_deserializer=crm__pb2.ListCustomerOrdersRequest.FromString,
+                    response_serializer=crm__pb2.ListOrdersResponse.SerializeToString,
+            ),
             'DeleteOrder': grpc.unary_unary_rpc_method_handler(
                     servicer.DeleteOrder,
                     request_deserializer=crm__pb2.DeleteOrderRequest.FromString,
                     response_serializer=crm__pb2.DeleteOrderResponse.SerializeToString,
             ),
+            'BatchCreateOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchCreateOrders,
+                    request_deserializer=crm__pb2.BatchCreateOrdersRequest.FromString,
+                    response_serializer=crm__pb2.BatchCreateOrdersResponse.SerializeToString,
+            ),
+            'ExportOrders': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExportOrders,
+                    request_deserializer=crm__pb2.ExportOrdersRequest.FromString,
+                    response_serializer=crm__pb2.OrderResponse.SerializeToString,
+            ),
+            'GetCustomerStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetCustomerStats,
+                    request_deserializer=crm__pb2.GetCustomerStatsRequest.FromString,
+                    response_serializer=crm__pb2.CustomerStatsResponse.SerializeToString,
+            ),
+            'ListArchivedOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListArchivedOrders,
+                    request_deserializer=crm__pb2.ListArchivedOrdersRequest.FromString,
+                    response_serializer=crm__pb2.ListOrdersResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'crm.OrderService', rpc_method_handlers)
@@ -442,6 +651,33 @@ class OrderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ListCustomerOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.OrderService/ListCustomerOrders',
+            crm__pb2.ListCustomerOrdersRequest.SerializeToString,
+            crm__pb2.ListOrdersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def DeleteOrder(request,
             target,
@@ -468,3 +704,111 @@ class OrderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def BatchCreateOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.OrderService/BatchCreateOrders',
+            crm__pb2.BatchCreateOrdersRequest.SerializeToString,
+            crm__pb2.BatchCreateOrdersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ExportOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/crm.OrderService/ExportOrders',
+            crm__pb2.ExportOrdersRequest.SerializeToString,
+            crm__pb2.OrderResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetCustomerStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.OrderService/GetCustomerStats',
+            crm__pb2.GetCustomerStatsRequest.SerializeToString,
+            crm__pb2.CustomerStatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListArchivedOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/crm.OrderService/ListArchivedOrders',
+            crm__pb2.ListArchivedOrdersRequest.SerializeToString,
+            crm__pb2.ListOrdersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,164 @@
+"""PostgreSQL storage for CustomerService."""
+import sys
+from pathlib import Path
+from psycopg2.extras import execute_values
+sys.path.append(str(Path(__file__).parent.parent))
+from common.metrics import timed_query
+from common.migrations import Migration, create_index_concurrently
+from common.repository import CustomerRepository, PostgresRepository, translate_errors
+from common.row_counts import install_row_counter, total_query
+from common.statements import STATEMENTS
+
+MIGRATIONS = [
+    Migration(1, "create_customers", '''
+        CREATE TABLE IF NOT EXISTS customers (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP NOT NULL
+        )
+    '''),
+    Migration(2, "customers_row_counter", lambda cursor: install_row_counter(cursor, "customers")),
+    Migration(
+        3,
+        "customers_created_at_index",
+        create_index_concurrently("idx_customers_created_id", "customers", "created_at DESC, id DESC"),
+        transactional=False
+    ),
+    # Trigram indexes answer ILIKE '%...%' on name and email, for search.
+    Migration(4, "pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    Migration(
+        5,
+        "customers_name_trgm_index",
+        create_index_concurrently("idx_customers_name_trgm", "customers", "name gin_trgm_ops", method="gin"),
+        transactional=False
+    ),
+    Migration(
+        6,
+        "customers_email_trgm_index",
+        create_index_concurrently("idx_customers_email_trgm", "customers", "email gin_trgm_ops", method="gin"),
+        transactional=False
+    ),
+]
+
+# Hot statements, prepared once per pooled connection.
+INSERT_CUSTOMER = STATEMENTS.statement("insert_customer", '''
+    INSERT INTO customers (id, name, email, created_at)
+    VALUES (%s, %s, %s, %s)''')
+SELECT_CUSTOMER = STATEMENTS.statement("select_customer", '''
+    SELECT id, name, email, created_at
+    FROM customers WHERE id = %s''')
+SELECT_CUSTOMERS = STATEMENTS.statement("select_customers", '''
+    SELECT id, name, email, created_at
+    FROM customers WHERE id = ANY(%s)''')
+LIST_CUSTOMERS = STATEMENTS.statement("list_customers", '''
+    SELECT id, name, email, created_at
+    FROM customers
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s OFFSET %s''')
+# Keyset pagination: seek past the last row of the previous page instead
+# of counting through OFFSET rows.
+LIST_CUSTOMERS_AFTER = STATEMENTS.statement("list_customers_after", '''
+    SELECT id, name, email, created_at
+    FROM customers
+    WHERE (created_at, id) < (%s, %s)
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s''')
+
+# Exact matches first, then prefix matches, then other substring matches,
+# each group by trigram similarity.
+SEARCH_CUSTOMERS = STATEMENTS.statement("search_customers", '''
+    SELECT id, name, email, created_at
+    FROM customers
+    WHERE name ILIKE %s OR email ILIKE %s
+    ORDER BY
+        CASE
+            WHEN lower(name) = lower(%s::text) OR lower(email) = lower(%s::text) THEN 0
+            WHEN name ILIKE %s OR email ILIKE %s THEN 1
+            ELSE 2
+        END,
+        GREATEST(similarity(name, %s), similarity(email, %s)) DESC,
+        name, id
+    LIMIT %s''')
+
+
+def _like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_customers_params(query, limit):
+    contains = f"%{_like_escape(query)}%"
+    prefix = f"{_like_escape(query)}%"
+    return (contains, contains, query, query, prefix, prefix, query, query, limit)
+
+
+def _list_customers_query(limit, offset=0, after=None):
+    if after is not None:
+        return LIST_CUSTOMERS_AFTER, (*after, limit)
+    return LIST_CUSTOMERS, (limit, offset)
+
+
+class PostgresCustomerRepository(PostgresRepository, CustomerRepository):
+    def __init__(self):
+        super().__init__("customer_service", MIGRATIONS)
+
+    def create(self, customer_id, name, email, created_at):
+        self._execute_query(INSERT_CUSTOMER, (customer_id, name, email, created_at))
+
+    def get(self, customer_id):
+        return self._execute_query(SELECT_CUSTOMER, (customer_id,), fetchone=True)
+
+    def get_many(self, customer_ids):
+        return self._execute_query(SELECT_CUSTOMERS, (list(customer_ids),), fetchall=True)
+
+    def search(self, query, limit):
+        return self._execute_query(SEARCH_CUSTOMERS, _search_customers_params(query, limit), fetchall=True)
+
+    def update(self, customer_id, name, email):
+        self._execute_query(
+            '''UPDATE customers
+               SET name = %s, email = %s
+               WHERE id = %s''',
+            (name, email, customer_id)
+        )
+
+    def delete(self, customer_id):
+        self._execute_query(
+            '''DELETE FROM customers WHERE id = %s''',
+            (customer_id,)
+        )
+
+    def list(self, limit, offset=0, after=None):
+        return self._execute_query(*_list_customers_query(limit, offset, after), fetchall=True)
+
+    def count(self, count_mode):
+        query = total_query("customers", count_mode)
+        if query is None:
+            return None
+        row = self._execute_query(*query, fetchone=True)
+        return row[0] if row else 0
+
+    def batch_create(self, rows):
+        conn = self._checkout()
+        try:
+            with translate_errors(), conn.cursor() as cursor, timed_query() as timed:
+                # One multi-row INSERT; rows whose email is already taken
+                # are skipped instead of failing the batch.
+                inserted = {row[0] for row in execute_values(
+                    cursor,
+                    '''INSERT INTO customers (id, name, email, created_at)
+                       VALUES %s
+                       ON CONFLICT (email) DO NOTHING
+                       RETURNING id''',
+                    rows,
+                    page_size=len(rows),
+                    fetch=True
+                )}
+                timed.rows = len(inserted)
+                conn.commit()
+            return inserted
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.put_conn(conn)
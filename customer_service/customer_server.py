@@ -1,185 +1,308 @@
 from concurrent import futures
+import asyncio
 import grpc
 import uuid
 from datetime import datetime
-import psycopg2
-from psycopg2 import pool
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from crm_pb2 import *
 from crm_pb2_grpc import *
+from common.pagination import encode_cursor, decode_cursor
+from common.workers import GRPC_WORKERS, supervise, worker_metrics_port
+from common.grpc_options import compress_large, server_options
+from common.cache import LRUCache
+from common.memory import MemoryStore
+from common.repository import STORAGE_BACKEND, DuplicateEmailError, PostgresRepository, StorageError
+from common.metrics import (
+    METRICS_HOST,
+    REGISTRY,
+    MetricsInterceptor,
+    cache_collector,
+    pool_collector,
+    start_metrics_server,
+)
+from customer_repository import PostgresCustomerRepository
 import os
 
-POSTGRES_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "dbname": os.getenv("POSTGRES_DB", "crm_db"),
-    "user": os.getenv("POSTGRES_USER", "postgres"),
-    "password": os.getenv("POSTGRES_PASSWORD", "123456")
+# "threads" serves RPCs from a thread pool over psycopg2; "aio" runs the
+# grpc.aio server over psycopg 3's async pool (see customer_server_aio.py).
+GRPC_SERVER_MODE = os.getenv("GRPC_SERVER_MODE", "threads")
+
+# Read-through cache for GetCustomer. The cache is per process, so with
+# several replicas an update elsewhere is visible here after at most ttl
+# seconds. A maxsize of 0 turns the cache off.
+CUSTOMER_CACHE_CONFIG = {
+    "maxsize": int(os.getenv("CUSTOMER_CACHE_SIZE", "10000")),
+    "ttl": float(os.getenv("CUSTOMER_CACHE_TTL", "60"))
 }
+# Workers under GRPC_WORKERS > 1 are such replicas: UpdateCustomer and
+# DeleteCustomer only invalidate the handling worker's entry, so the
+# others may serve the old customer until theirs expires. The TTL is
+# capped there to keep that window short.
+MAX_WORKER_CACHE_TTL = 5.0
+if GRPC_WORKERS > 1:
+    CUSTOMER_CACHE_CONFIG["ttl"] = min(CUSTOMER_CACHE_CONFIG["ttl"], MAX_WORKER_CACHE_TTL)
 
-class PostgresConnectionPool:
-    _instance = None
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_pool()
-        return cls._instance
+# Shorter queries have no trigram to look up and would scan the table.
+MIN_SEARCH_LENGTH = 3
+MAX_SEARCH_LIMIT = 100
 
-    def _init_pool(self):
-        self.pool = psycopg2.pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            **POSTGRES_CONFIG
-        )
+# Port of the Prometheus /metrics endpoint; 0 turns it off.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
 
-    def get_conn(self):
-        return self.pool.getconn()
+def _customer_from_row(row):
+    return CustomerResponse(
+        id=row[0],
+        name=row[1],
+        email=row[2],
+        created_at=row[3].isoformat()
+    )
 
-    def put_conn(self, conn):
-        self.pool.putconn(conn)
+def _batch_get_ids(request):
+    """Distinct non-empty ids of a BatchGetCustomers request, in request order."""
+    return [customer_id for customer_id in dict.fromkeys(request.ids) if customer_id]
 
-class CustomerService(CustomerServiceServicer):
-    def __init__(self):
-        self.pool = PostgresConnectionPool()
-        self._init_db()
+def _cached_customers(cache, ids):
+    """Returns the rows found in the cache and the ids still to be loaded."""
+    rows, missing = [], []
+    for customer_id in ids:
+        row = cache.get(customer_id)
+        if row is None:
+            missing.append(customer_id)
+        else:
+            rows.append(row)
+    return rows, missing
 
-    def _init_db(self):
-        conn = self.pool.get_conn()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS customers (
-                        id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        email TEXT NOT NULL UNIQUE,
-                        created_at TIMESTAMP NOT NULL
-                    )
-                ''')
-                conn.commit()
-        finally:
-            self.pool.put_conn(conn)
-
-    def _execute_query(self, query, params=None, fetchone=False, fetchall=False):
-        conn = self.pool.get_conn()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params or ())
-                if fetchone:
-                    return cursor.fetchone()
-                if fetchall:
-                    return cursor.fetchall()
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            self.pool.put_conn(conn)
+def _search_arguments(request):
+    """Returns the stripped query and the limit, or an error message."""
+    query = request.query.strip()
+    if len(query) < MIN_SEARCH_LENGTH:
+        return None, None, f"query must be at least {MIN_SEARCH_LENGTH} characters"
+    if not 0 < request.limit <= MAX_SEARCH_LIMIT:
+        return None, None, f"limit must be between 1 and {MAX_SEARCH_LIMIT}"
+    return query, request.limit, None
+
+def _list_customers_response(request, customers):
+    next_cursor = ""
+    if len(customers) == request.limit:
+        next_cursor = encode_cursor(customers[-1][3], customers[-1][0])
+    return ListCustomersResponse(
+        customers=[_customer_from_row(row) for row in customers],
+        next_cursor=next_cursor
+    )
+
+def _prepare_customer_batch(request, created_at):
+    """Splits a batch into insertable rows and per-item validation errors."""
+    errors = []
+    rows = []
+    seen_emails = set()
+    for index, item in enumerate(request.customers):
+        if not item.name or not item.email:
+            errors.append(BatchItemError(
+                index=index, code="INVALID_ARGUMENT", message="name and email are required"
+            ))
+        elif item.email in seen_emails:
+            errors.append(BatchItemError(
+                index=index, code="ALREADY_EXISTS", message="Email уже существует"
+            ))
+        else:
+            seen_emails.add(item.email)
+            rows.append((index, str(uuid.uuid4()), item.name, item.email, created_at))
+    return rows, errors
+
+def _customer_batch_response(rows, errors, inserted, created_at):
+    customers = []
+    for index, customer_id, name, email, _ in rows:
+        if customer_id in inserted:
+            customers.append(CustomerResponse(
+                id=customer_id,
+                name=name,
+                email=email,
+                created_at=created_at.isoformat()
+            ))
+        else:
+            errors.append(BatchItemError(
+                index=index, code="ALREADY_EXISTS", message="Email уже существует"
+            ))
+    return BatchCreateCustomersResponse(
+        customers=customers,
+        errors=sorted(errors, key=lambda error: error.index)
+    )
+
+def create_repository():
+    if STORAGE_BACKEND == "memory":
+        return MemoryStore().customers
+    return PostgresCustomerRepository()
+
+class CustomerService(CustomerServiceServicer):
+    def __init__(self, repository=None):
+        self.repository = repository or create_repository()
+        self.cache = LRUCache(**CUSTOMER_CACHE_CONFIG)
 
     def CreateCustomer(self, request, context):
         customer_id = str(uuid.uuid4())
         created_at = datetime.now()
         
         try:
-            self._execute_query(
-                '''INSERT INTO customers (id, name, email, created_at)
-                   VALUES (%s, %s, %s, %s)''',
-                (customer_id, request.name, request.email, created_at)
-            )
+            self.repository.create(customer_id, request.name, request.email, created_at)
             return CustomerResponse(
                 id=customer_id,
                 name=request.name,
                 email=request.email,
                 created_at=created_at.isoformat()
             )
-        except psycopg2.IntegrityError as e:
-            if "duplicate key" in str(e):
-                context.abort(grpc.StatusCode.ALREADY_EXISTS, "Email уже существует")
+        except DuplicateEmailError:
+            context.abort(grpc.StatusCode.ALREADY_EXISTS, "Email уже существует")
+        except StorageError as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
 
     def GetCustomer(self, request, context):
-        customer = self._execute_query(
-            '''SELECT id, name, email, created_at 
-               FROM customers WHERE id = %s''',
-            (request.id,),
-            fetchone=True
-        )
-        
-        if not customer:
-            context.abort(grpc.StatusCode.NOT_FOUND, "Клиент не найден")
+        customer = self.cache.get(request.id)
+        if customer is None:
+            version = self.cache.version
+            customer = self.repository.get(request.id)
             
-        return CustomerResponse(
-            id=customer[0],
-            name=customer[1],
-            email=customer[2],
-            created_at=customer[3].isoformat()
-        )
+            if not customer:
+                context.abort(grpc.StatusCode.NOT_FOUND, "Клиент не найден")
+
+            self.cache.set(request.id, customer, version=version)
+            
+        return _customer_from_row(customer)
 
     def UpdateCustomer(self, request, context):
         try:
-            self._execute_query(
-                '''UPDATE customers 
-                   SET name = %s, email = %s 
-                   WHERE id = %s''',
-                (request.name, request.email, request.id)
-            )
+            self.repository.update(request.id, request.name, request.email)
+            self.cache.invalidate(request.id)
             return CustomerResponse(
                 id=request.id,
                 name=request.name,
                 email=request.email,
                 created_at="" 
             )
-        except psycopg2.Error as e:
+        except StorageError as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
 
     def DeleteCustomer(self, request, context):
         try:
-            self._execute_query(
-                '''DELETE FROM customers WHERE id = %s''',
-                (request.id,)
-            )
+            self.repository.delete(request.id)
+            self.cache.invalidate(request.id)
             return DeleteCustomerResponse(success=True)
-        except psycopg2.Error as e:
+        except StorageError as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
 
     def ListCustomers(self, request, context):
-        customers = self._execute_query(
-            '''SELECT id, name, email, created_at 
-               FROM customers
-               ORDER BY created_at DESC
-               LIMIT %s OFFSET %s''',
-            (request.limit, (request.page - 1) * request.limit),
-            fetchall=True
-        )
-        
-        customer_list = [
-            CustomerResponse(
-                id=row[0],
-                name=row[1],
-                email=row[2],
-                created_at=row[3].isoformat()
-            ) for row in customers
-        ]
-        
-        total = self._execute_query(
-            '''SELECT COUNT(*) FROM customers''',
-            fetchone=True
-        )[0]
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
+        try:
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+
+        customers = self.repository.list(request.limit, (request.page - 1) * request.limit, after)
+        response = _list_customers_response(request, customers)
+
+        total = self.repository.count(request.count_mode)
+        if total is not None:
+            response.total = total
         
-        return ListCustomersResponse(
-            customers=customer_list,
-            total=total
+        return compress_large(context, response)
+
+    def BatchCreateCustomers(self, request, context):
+        if len(request.customers) > MAX_BATCH_SIZE:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        created_at = datetime.now()
+        rows, errors = _prepare_customer_batch(request, created_at)
+
+        inserted = set()
+        if rows:
+            try:
+                # Rows whose email is already taken are skipped and
+                # reported instead of failing the batch.
+                inserted = self.repository.batch_create([row[1:] for row in rows])
+            except StorageError as e:
+                context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return _customer_batch_response(rows, errors, inserted, created_at)
+
+    def SearchCustomers(self, request, context):
+        query, limit, error = _search_arguments(request)
+        if error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, error)
+
+        try:
+            customers = self.repository.search(query, limit)
+        except StorageError as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return SearchCustomersResponse(customers=[_customer_from_row(row) for row in customers])
+
+    def BatchGetCustomers(self, request, context):
+        ids = _batch_get_ids(request)
+        if len(ids) > MAX_BATCH_SIZE:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        # Only the cache misses go to the database, in one query.
+        customers, missing = _cached_customers(self.cache, ids)
+        if missing:
+            version = self.cache.version
+            try:
+                loaded = self.repository.get_many(missing)
+            except StorageError as e:
+                context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+            for row in loaded:
+                self.cache.set(row[0], row, version=version)
+            customers.extend(loaded)
+
+        return compress_large(
+            context, BatchGetCustomersResponse(customers=[_customer_from_row(row) for row in customers])
         )
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_CustomerServiceServicer_to_server(CustomerService(), server)
+def serve_worker(worker=0):
+    """Runs the server in this process; worker is its index under the supervisor."""
+    if GRPC_SERVER_MODE == "aio":
+        from customer_server_aio import serve_aio
+        asyncio.run(serve_aio(worker))
+        return
+
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=10),
+        interceptors=[MetricsInterceptor()],
+        options=server_options(reuse_port=GRPC_WORKERS > 1)
+    )
+    service = CustomerService()
+    add_CustomerServiceServicer_to_server(service, server)
     server.add_insecure_port('[::]:50051')  
     print("Customer Service запущен на порту 50051")
+    metrics_port = worker_metrics_port(METRICS_PORT, worker)
+    if metrics_port:
+        if isinstance(service.repository, PostgresRepository):
+            REGISTRY.register_collector(pool_collector(service.repository.pool))
+        REGISTRY.register_collector(cache_collector(service.cache, "customers"))
+        try:
+            start_metrics_server(metrics_port)
+            print(f"Метрики Prometheus: http://{METRICS_HOST}:{metrics_port}/metrics")
+        except OSError as e:
+            # Without metrics the worker is still useful; exiting would
+            # only make the supervisor restart it over and over.
+            print(f"Не удалось запустить метрики на порту {metrics_port}: {e}")
     server.start()
     server.wait_for_termination()
 
+def serve():
+    if STORAGE_BACKEND != "postgres":
+        if GRPC_SERVER_MODE == "aio":
+            raise SystemExit("GRPC_SERVER_MODE=aio only supports STORAGE_BACKEND=postgres")
+        if GRPC_WORKERS > 1:
+            # Every worker would hold its own, diverging copy of the data.
+            raise SystemExit("GRPC_WORKERS > 1 only supports STORAGE_BACKEND=postgres")
+    if GRPC_WORKERS > 1:
+        supervise(serve_worker, GRPC_WORKERS, "Customer Service")
+    else:
+        serve_worker()
+
 if __name__ == '__main__':
     serve()
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""grpc.aio variant of CustomerService backed by psycopg 3's async pool.
+
+Selected with GRPC_SERVER_MODE=aio. RPCs no longer hold a thread for
+their whole database round trip, so concurrency is bounded by the pool
+size instead of the executor's worker count.
+"""
+import grpc
+import uuid
+from datetime import datetime
+import psycopg
+import psycopg2
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from crm_pb2 import *
+from crm_pb2_grpc import *
+from common.db import POSTGRES_CONFIG
+from common.aio_db import AIO_POOL_CONFIG, AsyncPostgresPool
+from common.cache import LRUCache
+from common.metrics import (
+    METRICS_HOST,
+    REGISTRY,
+    AsyncMetricsInterceptor,
+    cache_collector,
+    pool_collector,
+    start_metrics_server,
+)
+from common.grpc_options import compress_large, server_options
+from common.migrations import apply_migrations
+from common.workers import GRPC_WORKERS, worker_metrics_port
+from common.pagination import decode_cursor
+from common.row_counts import total_query
+from customer_repository import (
+    INSERT_CUSTOMER,
+    MIGRATIONS,
+    SEARCH_CUSTOMERS,
+    SELECT_CUSTOMER,
+    SELECT_CUSTOMERS,
+    _list_customers_query,
+    _search_customers_params,
+)
+from customer_server import (
+    CUSTOMER_CACHE_CONFIG,
+    MAX_BATCH_SIZE,
+    METRICS_PORT,
+    _batch_get_ids,
+    _cached_customers,
+    _customer_batch_response,
+    _customer_from_row,
+    _list_customers_response,
+    _prepare_customer_batch,
+    _search_arguments,
+)
+
+
+class AsyncCustomerService(CustomerServiceServicer):
+    def __init__(self, pool):
+        self.pool = pool
+        self.cache = LRUCache(**CUSTOMER_CACHE_CONFIG)
+
+    async def CreateCustomer(self, request, context):
+        customer_id = str(uuid.uuid4())
+        created_at = datetime.now()
+
+        try:
+            await self.pool.execute(
+                INSERT_CUSTOMER,
+                (customer_id, request.name, request.email, created_at)
+            )
+        except psycopg.errors.UniqueViolation:
+            await context.abort(grpc.StatusCode.ALREADY_EXISTS, "Email уже существует")
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return CustomerResponse(
+            id=customer_id,
+            name=request.name,
+            email=request.email,
+            created_at=created_at.isoformat()
+        )
+
+    async def GetCustomer(self, request, context):
+        customer = self.cache.get(request.id)
+        if customer is None:
+            version = self.cache.version
+            customer = await self.pool.execute(
+                SELECT_CUSTOMER,
+                (request.id,),
+                fetchone=True
+            )
+
+            if not customer:
+                await context.abort(grpc.StatusCode.NOT_FOUND, "Клиент не найден")
+
+            self.cache.set(request.id, customer, version=version)
+
+        return _customer_from_row(customer)
+
+    async def UpdateCustomer(self, request, context):
+        try:
+            await self.pool.execute(
+                '''UPDATE customers
+                   SET name = %s, email = %s
+                   WHERE id = %s''',
+                (request.name, request.email, request.id)
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        self.cache.invalidate(request.id)
+        return CustomerResponse(
+            id=request.id,
+            name=request.name,
+            email=request.email,
+            created_at=""
+        )
+
+    async def DeleteCustomer(self, request, context):
+        try:
+            await self.pool.execute(
+                '''DELETE FROM customers WHERE id = %s''',
+                (request.id,)
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        self.cache.invalidate(request.id)
+        return DeleteCustomerResponse(success=True)
+
+    async def ListCustomers(self, request, context):
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
+        try:
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+
+        customers = await self.pool.execute(
+            *_list_customers_query(request.limit, (request.page - 1) * request.limit, after),
+            fetchall=True
+        )
+        response = _list_customers_response(request, customers)
+
+        query = total_query("customers", request.count_mode)
+        if query is not None:
+            row = await self.pool.execute(*query, fetchone=True)
+            response.total = row[0] if row else 0
+
+        return compress_large(context, response)
+
+    async def BatchCreateCustomers(self, request, context):
+        if len(request.customers) > MAX_BATCH_SIZE:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        created_at = datetime.now()
+        rows, errors = _prepare_customer_batch(request, created_at)
+
+        inserted = set()
+        if rows:
+            _, ids, names, emails, created = zip(*rows)
+            try:
+                # unnest() turns the columns into rows, so the whole batch
+                # is a single INSERT with four array parameters.
+                inserted = {row[0] for row in await self.pool.execute(
+                    '''INSERT INTO customers (id, name, email, created_at)
+                       SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::timestamp[])
+                       ON CONFLICT (email) DO NOTHING
+                       RETURNING id''',
+                    (list(ids), list(names), list(emails), list(created)),
+                    fetchall=True
+                )}
+            except psycopg.Error as e:
+                await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return _customer_batch_response(rows, errors, inserted, created_at)
+
+    async def SearchCustomers(self, request, context):
+        query, limit, error = _search_arguments(request)
+        if error:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, error)
+
+        try:
+            customers = await self.pool.execute(
+                SEARCH_CUSTOMERS, _search_customers_params(query, limit), fetchall=True
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return SearchCustomersResponse(customers=[_customer_from_row(row) for row in customers])
+
+    async def BatchGetCustomers(self, request, context):
+        ids = _batch_get_ids(request)
+        if len(ids) > MAX_BATCH_SIZE:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        customers, missing = _cached_customers(self.cache, ids)
+        if missing:
+            version = self.cache.version
+            try:
+                loaded = await self.pool.execute(SELECT_CUSTOMERS, (missing,), fetchall=True)
+            except psycopg.Error as e:
+                await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+            for row in loaded:
+                self.cache.set(row[0], row, version=version)
+            customers.extend(loaded)
+
+        return compress_large(
+            context, BatchGetCustomersResponse(customers=[_customer_from_row(row) for row in customers])
+        )
+
+
+def _migrate():
+    conn = psycopg2.connect(**POSTGRES_CONFIG)
+    try:
+        apply_migrations(conn, "customer_service", MIGRATIONS)
+    finally:
+        conn.close()
+
+
+async def serve_aio(worker=0):
+    _migrate()
+    pool = AsyncPostgresPool(POSTGRES_CONFIG, **AIO_POOL_CONFIG)
+    await pool.open()
+    server = grpc.aio.server(interceptors=[AsyncMetricsInterceptor()], options=server_options(reuse_port=GRPC_WORKERS > 1))
+    service = AsyncCustomerService(pool)
+    add_CustomerServiceServicer_to_server(service, server)
+    server.add_insecure_port('[::]:50051')
+    print("Customer Service (grpc.aio) запущен на порту 50051")
+    metrics_port = worker_metrics_port(METRICS_PORT, worker)
+    if metrics_port:
+        REGISTRY.register_collector(pool_collector(pool))
+        REGISTRY.register_collector(cache_collector(service.cache, "customers"))
+        try:
+            start_metrics_server(metrics_port)
+            print(f"Метрики Prometheus: http://{METRICS_HOST}:{metrics_port}/metrics")
+        except OSError as e:
+            # Without metrics the worker is still useful; exiting would
+            # only make the supervisor restart it over and over.
+            print(f"Не удалось запустить метрики на порту {metrics_port}: {e}")
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        await pool.close()
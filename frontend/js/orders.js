@@ -28,7 +28,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             if (customerId) {
                 orders = await makeRequest(`/orders/${customerId}`);
             } else {
-                orders = await makeRequest(`/orders?page=1&limit=10`);
+                orders = await makeRequest(`/orders?page=1&limit=10&expand=customer`);
             }
             renderOrders();
         } catch (error) {
@@ -40,7 +40,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         ordersTable.innerHTML = '';
         
         orders.forEach(order => {
-            const customer = customers.find(c => c.id === order.customer_id) || {};
+            const customer = order.customer || customers.find(c => c.id === order.customer_id) || {};
             
             const row = document.createElement('tr');
             
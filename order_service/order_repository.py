@@ -0,0 +1,574 @@
+"""PostgreSQL storage for OrderService."""
+import os
+import sys
+import uuid
+from pathlib import Path
+from psycopg2.extras import execute_values
+sys.path.append(str(Path(__file__).parent.parent))
+from common.metrics import timed_query
+from common.migrations import Migration, create_index_concurrently
+from common.repository import OrderRepository, PostgresRepository, translate_errors
+from common.row_counts import install_row_counter, total_query
+from common.statements import STATEMENTS
+
+# Order count, spend and newest order per customer, kept by statement-level
+# triggers in the writer's own transaction. Besides CreateOrder and
+# DeleteOrder this covers batch inserts, imports and the cascade from a
+# deleted customer.
+_ORDER_STATS_DDL = '''
+    CREATE TABLE IF NOT EXISTS customer_order_stats (
+        customer_id TEXT PRIMARY KEY REFERENCES customers(id) ON DELETE CASCADE,
+        order_count BIGINT NOT NULL,
+        total_spent NUMERIC(16,2) NOT NULL,
+        last_order_at TIMESTAMP
+    );
+
+    CREATE OR REPLACE FUNCTION customer_order_stats_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM customer_order_stats;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE customer_order_stats s
+            SET order_count = s.order_count - d.order_count,
+                total_spent = s.total_spent - d.total_spent
+            FROM (
+                SELECT customer_id, COUNT(*) AS order_count, SUM(price) AS total_spent
+                FROM old_rows GROUP BY customer_id
+            ) d
+            WHERE s.customer_id = d.customer_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            -- Sorted so that concurrent batches lock stats rows in the same order.
+            INSERT INTO customer_order_stats AS s (customer_id, order_count, total_spent, last_order_at)
+            SELECT customer_id, COUNT(*), SUM(price), MAX(created_at)
+            FROM new_rows GROUP BY customer_id ORDER BY customer_id
+            ON CONFLICT (customer_id) DO UPDATE
+            SET order_count = s.order_count + EXCLUDED.order_count,
+                total_spent = s.total_spent + EXCLUDED.total_spent,
+                last_order_at = GREATEST(s.last_order_at, EXCLUDED.last_order_at);
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            -- The newest order may be among the removed ones; look it up
+            -- again through idx_orders_customer_created.
+            UPDATE customer_order_stats s
+            SET last_order_at = (SELECT MAX(o.created_at) FROM orders o WHERE o.customer_id = s.customer_id)
+            WHERE s.customer_id IN (SELECT DISTINCT customer_id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS orders_stats_insert ON orders;
+    CREATE TRIGGER orders_stats_insert AFTER INSERT ON orders
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+
+    DROP TRIGGER IF EXISTS orders_stats_update ON orders;
+    CREATE TRIGGER orders_stats_update AFTER UPDATE ON orders
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+
+    DROP TRIGGER IF EXISTS orders_stats_delete ON orders;
+    CREATE TRIGGER orders_stats_delete AFTER DELETE ON orders
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+
+    DROP TRIGGER IF EXISTS orders_stats_truncate ON orders;
+    CREATE TRIGGER orders_stats_truncate AFTER TRUNCATE ON orders
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+'''
+
+
+def install_order_stats(cursor):
+    """Creates customer_order_stats with its triggers and backfills it.
+
+    Runs in the migration's transaction: CREATE TRIGGER blocks writers to
+    orders until commit, so the backfill cannot miss a concurrent insert.
+    """
+    cursor.execute(_ORDER_STATS_DDL)
+    cursor.execute('''
+        INSERT INTO customer_order_stats (customer_id, order_count, total_spent, last_order_at)
+        SELECT customer_id, COUNT(*), SUM(price), MAX(created_at)
+        FROM orders GROUP BY customer_id
+        ON CONFLICT (customer_id) DO NOTHING
+    ''')
+
+
+# Monthly partitions are kept this many months ahead of the current one.
+ORDERS_PARTITIONS_AHEAD = int(os.getenv("ORDERS_PARTITIONS_AHEAD", "3"))
+# Seconds between the service's checks for missing partitions.
+PARTITION_CHECK_INTERVAL = 3600
+
+_ENSURE_PARTITIONS_DDL = '''
+    CREATE OR REPLACE FUNCTION orders_ensure_partitions(first_day DATE, last_day DATE) RETURNS INTEGER AS $$
+    DECLARE
+        month DATE := date_trunc('month', first_day);
+        next_month DATE;
+        partition_name TEXT;
+        created INTEGER := 0;
+    BEGIN
+        -- Every service worker runs this; one at a time is enough.
+        PERFORM pg_advisory_xact_lock(715002);
+        WHILE month <= last_day LOOP
+            next_month := month + interval '1 month';
+            partition_name := 'orders_' || to_char(month, 'YYYY_MM');
+            IF to_regclass(partition_name) IS NULL THEN
+                -- Rows of the month that landed in the default partition
+                -- have to move before ATTACH accepts the new one. Moving
+                -- them partition to partition fires none of the triggers
+                -- on orders, so counts and stats stay as they are.
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM orders_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+                     INSERT INTO %I SELECT * FROM moved',
+                    month, next_month, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE orders ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+                created := created + 1;
+            END IF;
+            month := next_month;
+        END LOOP;
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+
+def partition_orders(cursor):
+    """Rebuilds orders as a table range-partitioned by month on created_at.
+
+    Runs in one transaction that holds orders exclusively while the rows
+    are copied, so the service is unavailable for the duration. A default
+    partition catches rows outside the created months; the primary key
+    becomes (id, created_at), as partitioned keys must include created_at.
+    """
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'orders'::regclass")
+    if cursor.fetchone()[0] == 'p':
+        return
+    cursor.execute('''
+        LOCK TABLE orders IN ACCESS EXCLUSIVE MODE;
+        ALTER TABLE orders RENAME TO orders_unpartitioned;
+        ALTER INDEX orders_pkey RENAME TO orders_unpartitioned_pkey;
+
+        CREATE TABLE orders (
+            id TEXT NOT NULL,
+            customer_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            CONSTRAINT orders_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT valid_price CHECK (price > 0),
+            CONSTRAINT fk_customer
+                FOREIGN KEY (customer_id)
+                REFERENCES customers(id)
+                ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at);
+        CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+    ''')
+    cursor.execute(_ENSURE_PARTITIONS_DDL)
+    cursor.execute(
+        '''SELECT orders_ensure_partitions(
+               COALESCE(MIN(created_at), now())::date,
+               GREATEST(MAX(created_at), now() + %s * interval '1 month')::date
+           ) FROM orders_unpartitioned''',
+        (ORDERS_PARTITIONS_AHEAD,)
+    )
+    # Copied before the triggers exist, so row_counts and
+    # customer_order_stats keep their current, still correct values.
+    cursor.execute('''
+        INSERT INTO orders (id, customer_id, product_name, price, created_at)
+        SELECT id, customer_id, product_name, price, created_at FROM orders_unpartitioned;
+        DROP TABLE orders_unpartitioned;
+        CREATE INDEX idx_orders_customer_created ON orders (customer_id, created_at DESC);
+        CREATE INDEX idx_orders_created_id ON orders (created_at DESC, id DESC);
+        ANALYZE orders;
+    ''')
+    install_row_counter(cursor, "orders")
+    cursor.execute(_ORDER_STATS_DDL)
+
+
+# Orders older than the retention age move here in batches, so orders
+# only holds recent ones and its working set fits in memory. Archived
+# pages are only read when the archive itself is queried.
+_ORDERS_ARCHIVE_DDL = '''
+    CREATE TABLE IF NOT EXISTS orders_archive (
+        id TEXT NOT NULL,
+        customer_id TEXT NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+        product_name TEXT NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (id, created_at)
+    );
+    CREATE INDEX IF NOT EXISTS idx_orders_archive_customer_created ON orders_archive (customer_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_orders_archive_created_id ON orders_archive (created_at DESC, id DESC);
+
+    -- Migration 5's function with last_order_at looked up in both tables,
+    -- since stats cover archived orders as well.
+    CREATE OR REPLACE FUNCTION customer_order_stats_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM customer_order_stats;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE customer_order_stats s
+            SET order_count = s.order_count - d.order_count,
+                total_spent = s.total_spent - d.total_spent
+            FROM (
+                SELECT customer_id, COUNT(*) AS order_count, SUM(price) AS total_spent
+                FROM old_rows GROUP BY customer_id
+            ) d
+            WHERE s.customer_id = d.customer_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            -- Sorted so that concurrent batches lock stats rows in the same order.
+            INSERT INTO customer_order_stats AS s (customer_id, order_count, total_spent, last_order_at)
+            SELECT customer_id, COUNT(*), SUM(price), MAX(created_at)
+            FROM new_rows GROUP BY customer_id ORDER BY customer_id
+            ON CONFLICT (customer_id) DO UPDATE
+            SET order_count = s.order_count + EXCLUDED.order_count,
+                total_spent = s.total_spent + EXCLUDED.total_spent,
+                last_order_at = GREATEST(s.last_order_at, EXCLUDED.last_order_at);
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            -- The newest order may be among the removed ones, and it may
+            -- now live in either table.
+            UPDATE customer_order_stats s
+            SET last_order_at = GREATEST(
+                (SELECT MAX(o.created_at) FROM orders o WHERE o.customer_id = s.customer_id),
+                (SELECT MAX(a.created_at) FROM orders_archive a WHERE a.customer_id = s.customer_id)
+            )
+            WHERE s.customer_id IN (SELECT DISTINCT customer_id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- Moving an order deletes it from orders and inserts it here; with
+    -- the same triggers on both tables its stats stay unchanged.
+    DROP TRIGGER IF EXISTS orders_archive_stats_insert ON orders_archive;
+    CREATE TRIGGER orders_archive_stats_insert AFTER INSERT ON orders_archive
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+
+    DROP TRIGGER IF EXISTS orders_archive_stats_delete ON orders_archive;
+    CREATE TRIGGER orders_archive_stats_delete AFTER DELETE ON orders_archive
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION customer_order_stats_apply();
+
+    CREATE OR REPLACE FUNCTION orders_drop_empty_partitions(before DATE) RETURNS INTEGER AS $$
+    DECLARE
+        partition_name TEXT;
+        is_empty BOOLEAN;
+        dropped INTEGER := 0;
+    BEGIN
+        FOR partition_name IN
+            SELECT c.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'orders'::regclass
+              AND c.relname ~ '^orders_[0-9]{4}_[0-9]{2}$'
+              AND to_date(substr(c.relname, 8), 'YYYY_MM') + interval '1 month' <= before
+        LOOP
+            EXECUTE format('SELECT NOT EXISTS (SELECT 1 FROM %I)', partition_name) INTO is_empty;
+            IF is_empty THEN
+                -- DROP locks all of orders; rather fail and retry on the
+                -- next run than queue every query behind a long export.
+                PERFORM set_config('lock_timeout', '2s', true);
+                LOCK TABLE orders IN ACCESS EXCLUSIVE MODE;
+                EXECUTE format('SELECT NOT EXISTS (SELECT 1 FROM %I)', partition_name) INTO is_empty;
+                IF is_empty THEN
+                    EXECUTE format('DROP TABLE %I', partition_name);
+                    dropped := dropped + 1;
+                END IF;
+            END IF;
+        END LOOP;
+        RETURN dropped;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+
+def install_orders_archive(cursor):
+    """Creates orders_archive, makes the stats triggers count it and seeds its row count."""
+    cursor.execute(_ORDERS_ARCHIVE_DDL)
+    install_row_counter(cursor, "orders_archive")
+
+
+MIGRATIONS = [
+    Migration(1, "create_orders", '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            CONSTRAINT valid_price CHECK (price > 0),
+            CONSTRAINT fk_customer
+                FOREIGN KEY (customer_id)
+                REFERENCES customers(id)
+                ON DELETE CASCADE
+        )
+    '''),
+    Migration(2, "orders_row_counter", lambda cursor: install_row_counter(cursor, "orders")),
+    # Serves per-customer listings and the ON DELETE CASCADE from customers.
+    Migration(
+        3,
+        "orders_customer_created_at_index",
+        create_index_concurrently("idx_orders_customer_created", "orders", "customer_id, created_at DESC"),
+        transactional=False
+    ),
+    Migration(
+        4,
+        "orders_created_at_index",
+        create_index_concurrently("idx_orders_created_id", "orders", "created_at DESC, id DESC"),
+        transactional=False
+    ),
+    Migration(5, "customer_order_stats", install_order_stats),
+    Migration(6, "partition_orders_by_month", partition_orders),
+    Migration(7, "orders_archive", install_orders_archive),
+]
+
+# Hot statements, prepared once per pooled connection.
+INSERT_ORDER = STATEMENTS.statement("insert_order", '''
+    INSERT INTO orders (id, customer_id, product_name, price, created_at)
+    VALUES (%s, %s, %s, %s, %s)''')
+
+# One batch of the retention job. SKIP LOCKED leaves orders that are being
+# written alone, so the batch never waits on a client transaction; both
+# tables' triggers run once for the whole batch.
+ARCHIVE_ORDERS = STATEMENTS.statement("archive_orders", '''
+    WITH moved AS (
+        DELETE FROM orders
+        WHERE (id, created_at) IN (
+            SELECT id, created_at FROM orders
+            WHERE created_at < %s
+            ORDER BY created_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, customer_id, product_name, price, created_at
+    ), archived AS (
+        INSERT INTO orders_archive (id, customer_id, product_name, price, created_at)
+        SELECT id, customer_id, product_name, price, created_at FROM moved
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM archived''')
+
+DROP_EMPTY_PARTITIONS = '''SELECT orders_drop_empty_partitions(%s)'''
+
+ENSURE_PARTITIONS = '''
+    SELECT orders_ensure_partitions(current_date, (current_date + %s * interval '1 month')::date)'''
+
+
+# Customers without orders have no stats row; the join tells them apart
+# from customers that do not exist.
+SELECT_CUSTOMER_STATS = STATEMENTS.statement("select_customer_stats", '''
+    SELECT COALESCE(s.order_count, 0), COALESCE(s.total_spent, 0), s.last_order_at
+    FROM customers c
+    LEFT JOIN customer_order_stats s ON s.customer_id = c.id
+    WHERE c.id = %s''')
+
+
+def _orders_filter(customer_id=None, created_from=None, created_to=None):
+    """WHERE conditions and params shared by listings, totals and exports.
+
+    created_from is inclusive and created_to exclusive. Bounds on
+    created_at let the planner skip partitions outside the range.
+    """
+    conditions, params = [], []
+    if customer_id is not None:
+        conditions.append("customer_id = %s")
+        params.append(customer_id)
+    if created_from is not None:
+        conditions.append("created_at >= %s")
+        params.append(created_from)
+    if created_to is not None:
+        conditions.append("created_at < %s")
+        params.append(created_to)
+    return conditions, params
+
+
+def _orders_page_query(
+    limit, offset=0, after=None, customer_id=None, created_from=None, created_to=None, table="orders"
+):
+    conditions, params = _orders_filter(customer_id, created_from, created_to)
+    if after is not None:
+        # Keyset pagination: seek past the last row of the previous page
+        # instead of counting through OFFSET rows. The plain bound on
+        # created_at is implied, but only it prunes partitions.
+        conditions.append("(created_at, id) < (%s, %s) AND created_at <= %s")
+        params.extend((*after, after[0]))
+        offset = 0
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Each table and filter combination is its own prepared statement.
+    name = f"list_{table}"
+    if customer_id is not None:
+        name += "_by_customer"
+    if created_from is not None:
+        name += "_from"
+    if created_to is not None:
+        name += "_to"
+    if after is not None:
+        name += "_after"
+    statement = STATEMENTS.statement(name, f'''
+        SELECT id, customer_id, product_name, price, created_at
+        FROM {table}
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s OFFSET %s''')
+    return statement, (*params, limit, offset)
+
+
+def orders_total_query(count_mode, customer_id=None, created_from=None, created_to=None):
+    conditions, params = _orders_filter(customer_id, created_from, created_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return total_query("orders", count_mode, where, params)
+
+
+def export_query(customer_id=None, created_from=None, created_to=None):
+    conditions, params = _orders_filter(customer_id, created_from, created_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # The export covers the whole history, archived orders included; both
+    # sides come ordered off their (created_at, id) indexes and are merged.
+    return (
+        f'''SELECT id, customer_id, product_name, price, created_at
+        FROM orders_archive
+        {where}
+        UNION ALL
+        SELECT id, customer_id, product_name, price, created_at
+        FROM orders
+        {where}
+        ORDER BY created_at, id''',
+        params * 2
+    )
+
+
+class PostgresOrderRepository(PostgresRepository, OrderRepository):
+    def __init__(self):
+        super().__init__("order_service", MIGRATIONS)
+
+    def create(self, order_id, customer_id, product_name, price, created_at):
+        self._execute_query(INSERT_ORDER, (order_id, customer_id, product_name, price, created_at))
+
+    def latest_for_customer(self, customer_id):
+        return self._execute_query(
+            '''SELECT id, customer_id, product_name, price, created_at
+            FROM orders
+            WHERE customer_id = %s
+            ORDER BY created_at DESC
+            LIMIT 1''',
+            (customer_id,),
+            fetchone=True
+        )
+
+    def list(self, limit, offset=0, after=None, customer_id=None, created_from=None, created_to=None):
+        return self._execute_query(
+            *_orders_page_query(limit, offset, after, customer_id, created_from, created_to), fetchall=True
+        )
+
+    def count(self, count_mode, customer_id=None, created_from=None, created_to=None):
+        query = orders_total_query(count_mode, customer_id, created_from, created_to)
+        if query is None:
+            return None
+        row = self._execute_query(*query, fetchone=True)
+        return row[0] if row else 0
+
+    def stats(self, customer_id):
+        return self._execute_query(SELECT_CUSTOMER_STATS, (customer_id,), fetchone=True)
+
+    def archive(self, cutoff, batch_size):
+        conn = self._checkout()
+        try:
+            with translate_errors(), conn.cursor() as cursor, timed_query() as timed:
+                STATEMENTS.execute(cursor, ARCHIVE_ORDERS, (cutoff, batch_size))
+                moved = cursor.fetchone()[0]
+                timed.rows = moved
+                conn.commit()
+            return moved
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.put_conn(conn)
+
+    def list_archived(self, limit, after=None, customer_id=None, created_from=None, created_to=None):
+        return self._execute_query(
+            *_orders_page_query(limit, 0, after, customer_id, created_from, created_to, table="orders_archive"),
+            fetchall=True
+        )
+
+    def drop_empty_partitions(self, cutoff):
+        """Drops the emptied monthly partitions that lie entirely before cutoff."""
+        self._execute_query(DROP_EMPTY_PARTITIONS, (cutoff.date(),))
+
+    def ensure_partitions(self, months_ahead=ORDERS_PARTITIONS_AHEAD):
+        """Creates any missing monthly partition up to months_ahead months from now."""
+        self._execute_query(ENSURE_PARTITIONS, (months_ahead,))
+
+    def delete(self, order_id):
+        self._execute_query(
+            '''DELETE FROM orders WHERE id = %s''',
+            (order_id,)
+        )
+
+    def batch_create(self, rows):
+        conn = self._checkout()
+        try:
+            with translate_errors(), conn.cursor() as cursor, timed_query() as timed:
+                # FOR KEY SHARE keeps the referenced customers from being
+                # deleted before commit, so the FK check cannot fail the batch.
+                cursor.execute(
+                    '''SELECT id FROM customers WHERE id = ANY(%s) FOR KEY SHARE''',
+                    (list({row[1] for row in rows}),)
+                )
+                known_customers = {row[0] for row in cursor.fetchall()}
+                timed.rows = len(known_customers)
+                valid_rows = [row for row in rows if row[1] in known_customers]
+                if valid_rows:
+                    execute_values(
+                        cursor,
+                        '''INSERT INTO orders (id, customer_id, product_name, price, created_at)
+                           VALUES %s''',
+                        valid_rows,
+                        page_size=len(valid_rows)
+                    )
+                conn.commit()
+            return known_customers
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.put_conn(conn)
+
+    def export(self, batch_size, customer_id=None, created_from=None, created_to=None):
+        query, params = export_query(customer_id, created_from, created_to)
+        conn = self._checkout()
+        try:
+            # A named cursor keeps the result set on the server and hands it
+            # out batch_size rows at a time, so memory stays flat however
+            # many orders match.
+            with translate_errors(), conn.cursor(name=f"export_orders_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = batch_size
+                with timed_query():
+                    cursor.execute(query, params)
+                while True:
+                    # Only the fetches count as database time; between them
+                    # the caller is busy with the rows already handed out.
+                    with timed_query() as timed:
+                        rows = cursor.fetchmany(batch_size)
+                        timed.rows = len(rows)
+                    if not rows:
+                        break
+                    yield from rows
+        finally:
+            # The export only reads, and the client may cancel mid-stream,
+            # so always end the transaction before returning the connection.
+            conn.rollback()
+            self.pool.put_conn(conn)
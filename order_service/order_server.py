@@ -1,88 +1,176 @@
 from concurrent import futures
+import asyncio
 import grpc
 import uuid
-from datetime import datetime
-import psycopg2
-from psycopg2 import pool
+from datetime import datetime, timedelta
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from crm_pb2 import *
 from crm_pb2_grpc import *
+from common.pagination import encode_cursor, decode_cursor
+from common.workers import GRPC_WORKERS, supervise, worker_metrics_port
+from common.grpc_options import compress_large, compress_stream, server_options
+from common.memory import MemoryStore
+from common.repository import STORAGE_BACKEND, PostgresRepository, StorageError
+from common.metrics import (
+    METRICS_HOST,
+    REGISTRY,
+    MetricsInterceptor,
+    pool_collector,
+    start_metrics_server,
+)
+from order_repository import PARTITION_CHECK_INTERVAL, PostgresOrderRepository
 import os
+import threading
+import time
 
-POSTGRES_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "dbname": os.getenv("POSTGRES_DB", "crm_db"),
-    "user": os.getenv("POSTGRES_USER", "postgres"),
-    "password": os.getenv("POSTGRES_PASSWORD", "123456")
-}
-
-class PostgresConnectionPool:
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_pool()
-        return cls._instance
-
-    def _init_pool(self):
-        self.pool = psycopg2.pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            **POSTGRES_CONFIG
-        )
+# "threads" serves RPCs from a thread pool over psycopg2; "aio" runs the
+# grpc.aio server over psycopg 3's async pool (see order_server_aio.py).
+GRPC_SERVER_MODE = os.getenv("GRPC_SERVER_MODE", "threads")
 
-    def get_conn(self):
-        return self.pool.getconn()
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Largest value that fits orders.price DECIMAL(10,2).
+MAX_PRICE = 99999999.99
 
-    def put_conn(self, conn):
-        self.pool.putconn(conn)
+# Port of the Prometheus /metrics endpoint; 0 turns it off.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9102"))
 
-class OrderService(OrderServiceServicer):
-    def __init__(self):
-        self.pool = PostgresConnectionPool()
-        self._init_db()
+# Orders older than this many days are moved to the archive; 0 keeps
+# every order in orders.
+ORDERS_RETENTION_DAYS = int(os.getenv("ORDERS_RETENTION_DAYS", "0"))
+# Orders moved per transaction, and the pause between such batches.
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVE_BATCH_PAUSE = 0.1
+# Seconds between runs of the retention job.
+RETENTION_CHECK_INTERVAL = 3600
 
-    def _init_db(self):
-        conn = self.pool.get_conn()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS orders (
-                        id TEXT PRIMARY KEY,
-                        customer_id TEXT NOT NULL,
-                        product_name TEXT NOT NULL,
-                        price DECIMAL(10,2) NOT NULL,
-                        created_at TIMESTAMP NOT NULL,
-                        CONSTRAINT valid_price CHECK (price > 0),
-                        CONSTRAINT fk_customer 
-                            FOREIGN KEY (customer_id) 
-                            REFERENCES customers(id)
-                            ON DELETE CASCADE
-                    )
-                ''')
-                conn.commit()
-        finally:
-            self.pool.put_conn(conn)
+ORDERS_ARCHIVED = REGISTRY.counter("orders_archived_total", "Orders moved to the archive by the retention job.")
 
-    def _execute_query(self, query, params=None, fetchone=False, fetchall=False):
-        conn = self.pool.get_conn()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params or ())
-                if fetchone:
-                    return cursor.fetchone()
-                if fetchall:
-                    return cursor.fetchall()
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            self.pool.put_conn(conn)
+def _order_from_row(row):
+    return OrderResponse(
+        id=row[0],
+        customer_id=row[1],
+        product_name=row[2],
+        price=row[3],
+        created_at=row[4].isoformat()
+    )
+
+def _customer_stats_response(customer_id, row):
+    order_count, total_spent, last_order_at = row
+    return CustomerStatsResponse(
+        customer_id=customer_id,
+        order_count=order_count,
+        total_spent=total_spent,
+        last_order_at=last_order_at.isoformat() if last_order_at else ""
+    )
+
+def _list_orders_response(limit, orders):
+    next_cursor = ""
+    if len(orders) == limit:
+        next_cursor = encode_cursor(orders[-1][4], orders[-1][0])
+    return ListOrdersResponse(
+        orders=[_order_from_row(row) for row in orders],
+        next_cursor=next_cursor
+    )
+
+def _prepare_order_batch(request):
+    """Splits a batch into insertable rows and per-item validation errors."""
+    errors = []
+    rows = []
+    for index, item in enumerate(request.orders):
+        if not item.customer_id or not item.product_name:
+            errors.append(BatchItemError(
+                index=index, code="INVALID_ARGUMENT", message="customer_id and product_name are required"
+            ))
+        elif not 0 < round(item.price, 2) <= MAX_PRICE:
+            errors.append(BatchItemError(
+                index=index, code="INVALID_ARGUMENT", message=f"price must be between 0.01 and {MAX_PRICE}"
+            ))
+        else:
+            rows.append((index, str(uuid.uuid4()), item.customer_id, item.product_name, item.price))
+    return rows, errors
+
+def _order_batch_response(rows, errors, known_customers, created_at):
+    orders = []
+    for index, order_id, customer_id, product_name, price in rows:
+        if customer_id in known_customers:
+            orders.append(OrderResponse(
+                id=order_id,
+                customer_id=customer_id,
+                product_name=product_name,
+                price=price,
+                created_at=created_at.isoformat()
+            ))
+        else:
+            errors.append(BatchItemError(
+                index=index, code="NOT_FOUND", message="Customer not found"
+            ))
+    return BatchCreateOrdersResponse(
+        orders=orders,
+        errors=sorted(errors, key=lambda error: error.index)
+    )
+
+def _created_range(request):
+    """Parses created_from and created_to. Raises ValueError for malformed timestamps."""
+    return (
+        datetime.fromisoformat(request.created_from) if request.created_from else None,
+        datetime.fromisoformat(request.created_to) if request.created_to else None
+    )
+
+def _export_filters(request):
+    """Parses the export filters. Raises ValueError for malformed timestamps."""
+    return (request.customer_id or None, *_created_range(request))
+
+def _archived_page_arguments(request):
+    """Parses ListArchivedOrders' cursor and range. Raises ValueError when malformed."""
+    after = decode_cursor(request.cursor) if request.cursor else None
+    return after, request.customer_id or None, *_created_range(request)
+
+def _retention_cutoff():
+    return datetime.now() - timedelta(days=ORDERS_RETENTION_DAYS)
+
+def _archive_old_orders(repository):
+    cutoff = _retention_cutoff()
+    moved = 0
+    while True:
+        batch = repository.archive(cutoff, ARCHIVE_BATCH_SIZE)
+        ORDERS_ARCHIVED.inc(value=batch)
+        moved += batch
+        if batch < ARCHIVE_BATCH_SIZE:
+            break
+        time.sleep(ARCHIVE_BATCH_PAUSE)
+    if isinstance(repository, PostgresOrderRepository):
+        repository.drop_empty_partitions(cutoff)
+    if moved:
+        print(f"В архив перенесено заказов: {moved}")
+
+def _run_periodically(task, interval, failure):
+    """Calls task every interval seconds from a daemon thread.
+
+    Any error is logged and retried on the next run: the thread must not
+    die, or partitions and archiving would silently stop.
+    """
+    def loop():
+        while True:
+            try:
+                task()
+            except Exception as e:
+                print(f"{failure}: {e}")
+            time.sleep(interval)
+    threading.Thread(target=loop, daemon=True).start()
+
+def create_repository():
+    if STORAGE_BACKEND == "memory":
+        # Customers live in the customer service's process, so orders
+        # cannot be checked against them here.
+        return MemoryStore(check_customers=False).orders
+    return PostgresOrderRepository()
+
+class OrderService(OrderServiceServicer):
+    def __init__(self, repository=None):
+        self.repository = repository or create_repository()
 
     def CreateOrder(self, request, context):
 
@@ -90,10 +178,8 @@ class OrderService(OrderServiceServicer):
         created_at = datetime.now()
 
         try:
-            self._execute_query(
-                '''INSERT INTO orders (id, customer_id, product_name, price, created_at)
-                   VALUES (%s, %s, %s, %s, %s)''',
-                (order_id, request.customer_id, request.product_name, request.price, created_at)
+            self.repository.create(
+                order_id, request.customer_id, request.product_name, request.price, created_at
             )
             return OrderResponse(
                 id=order_id,
@@ -102,40 +188,34 @@ class OrderService(OrderServiceServicer):
                 price=request.price,
                 created_at=created_at.isoformat()
             )
-        except psycopg2.IntegrityError as e:
+        except StorageError as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
 
+    def _fill_total(self, response, count_mode, customer_id=None, created_from=None, created_to=None):
+        total = self.repository.count(count_mode, customer_id, created_from, created_to)
+        if total is not None:
+            response.total = total
+
     def ListOrders(self, request, context):
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
         try:
-            if request.page <= 0 or request.limit <= 0:
-                context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
-
-            orders = self._execute_query(
-                '''SELECT id, customer_id, product_name, price, created_at 
-                FROM orders
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s''',
-                (request.limit, (request.page - 1) * request.limit),
-                fetchall=True
-            )
-            
-            total = self._execute_query(
-                '''SELECT COUNT(*) FROM orders''',
-                fetchone=True
-            )[0]
-            
-            return ListOrdersResponse(
-                orders=[
-                    OrderResponse(
-                        id=row[0],
-                        customer_id=row[1],
-                        product_name=row[2],
-                        price=row[3],
-                        created_at=row[4].isoformat()
-                    ) for row in orders
-                ],
-                total=total
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+        try:
+            created_from, created_to = _created_range(request)
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "created_from and created_to must be ISO 8601 timestamps")
+
+        try:
+            orders = self.repository.list(
+                request.limit, (request.page - 1) * request.limit, after,
+                created_from=created_from, created_to=created_to
             )
+            response = _list_orders_response(request.limit, orders)
+            self._fill_total(response, request.count_mode, created_from=created_from, created_to=created_to)
+            return compress_large(context, response)
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
             
@@ -144,46 +224,154 @@ class OrderService(OrderServiceServicer):
             context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
 
         try:
-            orders = self._execute_query(
-                '''SELECT id, customer_id, product_name, price, created_at 
-                FROM orders 
-                WHERE customer_id = %s
-                ORDER BY created_at DESC''',
-                (request.customer_id,),
-                fetchall=True
-            )
+            first_order = self.repository.latest_for_customer(request.customer_id)
             
-            if not orders:
+            if not first_order:
                 context.abort(grpc.StatusCode.NOT_FOUND, "No orders found")
 
-            first_order = orders[0]
-            return OrderResponse(
-                id=first_order[0],
-                customer_id=first_order[1],
-                product_name=first_order[2],
-                price=first_order[3],
-                created_at=first_order[4].isoformat()
-            )
+            return _order_from_row(first_order)
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
             
-    def DeleteOrder(self, request, context):
+    def ListCustomerOrders(self, request, context):
+        if not request.customer_id:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
         try:
-            self._execute_query(
-                '''DELETE FROM orders WHERE id = %s''',
-                (request.id,)
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+
+        try:
+            orders = self.repository.list(
+                request.limit, (request.page - 1) * request.limit, after, customer_id=request.customer_id
             )
+            response = _list_orders_response(request.limit, orders)
+            self._fill_total(response, request.count_mode, request.customer_id)
+            return compress_large(context, response)
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+    def DeleteOrder(self, request, context):
+        try:
+            self.repository.delete(request.id)
             return DeleteOrderResponse(success=True)
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
             
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_OrderServiceServicer_to_server(OrderService(), server)
+    def BatchCreateOrders(self, request, context):
+        if len(request.orders) > MAX_BATCH_SIZE:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        created_at = datetime.now()
+        rows, errors = _prepare_order_batch(request)
+
+        known_customers = set()
+        if rows:
+            try:
+                # Orders of unknown customers are skipped and reported
+                # instead of failing the batch.
+                known_customers = self.repository.batch_create([row[1:] + (created_at,) for row in rows])
+            except StorageError as e:
+                context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+        return _order_batch_response(rows, errors, known_customers, created_at)
+
+    def ExportOrders(self, request, context):
+        try:
+            customer_id, created_from, created_to = _export_filters(request)
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "created_from and created_to must be ISO 8601 timestamps")
+
+        compress_stream(context)
+        orders = self.repository.export(EXPORT_BATCH_SIZE, customer_id, created_from, created_to)
+        try:
+            for row in orders:
+                yield _order_from_row(row)
+        except StorageError as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        finally:
+            # Hands the connection back at once if the client cancelled.
+            orders.close()
+
+    def GetCustomerStats(self, request, context):
+        if not request.customer_id:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
+
+        try:
+            stats = self.repository.stats(request.customer_id)
+        except StorageError as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+        if stats is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Customer not found")
+        return _customer_stats_response(request.customer_id, stats)
+
+    def ListArchivedOrders(self, request, context):
+        if request.limit <= 0:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "limit must be a positive integer")
+        try:
+            after, customer_id, created_from, created_to = _archived_page_arguments(request)
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor, created_from or created_to")
+
+        try:
+            orders = self.repository.list_archived(request.limit, after, customer_id, created_from, created_to)
+        except StorageError as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        return compress_large(context, _list_orders_response(request.limit, orders))
+
+def serve_worker(worker=0):
+    """Runs the server in this process; worker is its index under the supervisor."""
+    if GRPC_SERVER_MODE == "aio":
+        from order_server_aio import serve_aio
+        asyncio.run(serve_aio(worker))
+        return
+
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=10),
+        interceptors=[MetricsInterceptor()],
+        options=server_options(reuse_port=GRPC_WORKERS > 1)
+    )
+    service = OrderService()
+    if isinstance(service.repository, PostgresOrderRepository):
+        _run_periodically(
+            service.repository.ensure_partitions, PARTITION_CHECK_INTERVAL, "Не удалось создать партиции заказов"
+        )
+    if ORDERS_RETENTION_DAYS > 0:
+        _run_periodically(
+            lambda: _archive_old_orders(service.repository), RETENTION_CHECK_INTERVAL,
+            "Не удалось перенести заказы в архив"
+        )
+    add_OrderServiceServicer_to_server(service, server)
     server.add_insecure_port('[::]:50052')
     print("Order Service запущен на порту 50052")
+    metrics_port = worker_metrics_port(METRICS_PORT, worker)
+    if metrics_port:
+        if isinstance(service.repository, PostgresRepository):
+            REGISTRY.register_collector(pool_collector(service.repository.pool))
+        try:
+            start_metrics_server(metrics_port)
+            print(f"Метрики Prometheus: http://{METRICS_HOST}:{metrics_port}/metrics")
+        except OSError as e:
+            # Without metrics the worker is still useful; exiting would
+            # only make the supervisor restart it over and over.
+            print(f"Не удалось запустить метрики на порту {metrics_port}: {e}")
     server.start()
     server.wait_for_termination()
 
+def serve():
+    if STORAGE_BACKEND != "postgres":
+        if GRPC_SERVER_MODE == "aio":
+            raise SystemExit("GRPC_SERVER_MODE=aio only supports STORAGE_BACKEND=postgres")
+        if GRPC_WORKERS > 1:
+            # Every worker would hold its own, diverging copy of the data.
+            raise SystemExit("GRPC_WORKERS > 1 only supports STORAGE_BACKEND=postgres")
+    if GRPC_WORKERS > 1:
+        supervise(serve_worker, GRPC_WORKERS, "Order Service")
+    else:
+        serve_worker()
+
 if __name__ == '__main__':
     serve()
\ No newline at end of file
@@ -0,0 +1,337 @@
+"""grpc.aio variant of OrderService backed by psycopg 3's async pool.
+
+Selected with GRPC_SERVER_MODE=aio. RPCs no longer hold a thread for
+their whole database round trip, so concurrency is bounded by the pool
+size instead of the executor's worker count.
+"""
+import asyncio
+import grpc
+import uuid
+from datetime import datetime
+import psycopg
+import psycopg2
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from crm_pb2 import *
+from crm_pb2_grpc import *
+from common.db import POSTGRES_CONFIG
+from common.aio_db import AIO_POOL_CONFIG, AsyncPostgresPool
+from common.metrics import (
+    METRICS_HOST,
+    REGISTRY,
+    AsyncMetricsInterceptor,
+    pool_collector,
+    start_metrics_server,
+    timed_query,
+)
+from common.grpc_options import compress_large, compress_stream, server_options
+from common.migrations import apply_migrations
+from common.workers import GRPC_WORKERS, worker_metrics_port
+from common.pagination import decode_cursor
+from order_repository import (
+    ARCHIVE_ORDERS,
+    DROP_EMPTY_PARTITIONS,
+    ENSURE_PARTITIONS,
+    INSERT_ORDER,
+    MIGRATIONS,
+    ORDERS_PARTITIONS_AHEAD,
+    PARTITION_CHECK_INTERVAL,
+    SELECT_CUSTOMER_STATS,
+    _orders_page_query,
+    export_query,
+    orders_total_query,
+)
+from order_server import (
+    ARCHIVE_BATCH_PAUSE,
+    ARCHIVE_BATCH_SIZE,
+    EXPORT_BATCH_SIZE,
+    MAX_BATCH_SIZE,
+    METRICS_PORT,
+    ORDERS_ARCHIVED,
+    ORDERS_RETENTION_DAYS,
+    RETENTION_CHECK_INTERVAL,
+    _archived_page_arguments,
+    _created_range,
+    _customer_stats_response,
+    _export_filters,
+    _list_orders_response,
+    _order_batch_response,
+    _order_from_row,
+    _prepare_order_batch,
+    _retention_cutoff,
+)
+
+
+class AsyncOrderService(OrderServiceServicer):
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def _fill_total(self, response, query):
+        if query is not None:
+            row = await self.pool.execute(*query, fetchone=True)
+            response.total = row[0] if row else 0
+
+    async def CreateOrder(self, request, context):
+        order_id = str(uuid.uuid4())
+        created_at = datetime.now()
+
+        try:
+            await self.pool.execute(
+                INSERT_ORDER,
+                (order_id, request.customer_id, request.product_name, request.price, created_at)
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Ошибка базы данных: {str(e)}")
+
+        return OrderResponse(
+            id=order_id,
+            customer_id=request.customer_id,
+            product_name=request.product_name,
+            price=request.price,
+            created_at=created_at.isoformat()
+        )
+
+    async def ListOrders(self, request, context):
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
+        try:
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+        try:
+            created_from, created_to = _created_range(request)
+        except ValueError:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT, "created_from and created_to must be ISO 8601 timestamps"
+            )
+
+        try:
+            orders = await self.pool.execute(
+                *_orders_page_query(
+                    request.limit, (request.page - 1) * request.limit, after,
+                    created_from=created_from, created_to=created_to
+                ),
+                fetchall=True
+            )
+            response = _list_orders_response(request.limit, orders)
+            await self._fill_total(response, orders_total_query(
+                request.count_mode, created_from=created_from, created_to=created_to
+            ))
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        return compress_large(context, response)
+
+    async def GetCustomerOrder(self, request, context):
+        if not request.customer_id:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
+
+        try:
+            first_order = await self.pool.execute(
+                '''SELECT id, customer_id, product_name, price, created_at
+                FROM orders
+                WHERE customer_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1''',
+                (request.customer_id,),
+                fetchone=True
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+        if not first_order:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "No orders found")
+        return _order_from_row(first_order)
+
+    async def ListCustomerOrders(self, request, context):
+        if not request.customer_id:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
+        if request.limit <= 0 or (not request.cursor and request.page <= 0):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page and limit must be positive integers")
+        try:
+            after = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+
+        try:
+            orders = await self.pool.execute(
+                *_orders_page_query(
+                    request.limit, (request.page - 1) * request.limit, after, customer_id=request.customer_id
+                ),
+                fetchall=True
+            )
+            response = _list_orders_response(request.limit, orders)
+            await self._fill_total(response, orders_total_query(request.count_mode, request.customer_id))
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        return compress_large(context, response)
+
+    async def DeleteOrder(self, request, context):
+        try:
+            await self.pool.execute(
+                '''DELETE FROM orders WHERE id = %s''',
+                (request.id,)
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        return DeleteOrderResponse(success=True)
+
+    async def BatchCreateOrders(self, request, context):
+        if len(request.orders) > MAX_BATCH_SIZE:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch size must not exceed {MAX_BATCH_SIZE}")
+
+        created_at = datetime.now()
+        rows, errors = _prepare_order_batch(request)
+
+        known_customers = set()
+        if rows:
+            try:
+                async with self.pool.connection() as conn:
+                    async with conn.cursor() as cursor:
+                        with timed_query() as timed:
+                            # FOR KEY SHARE keeps the referenced customers from being
+                            # deleted before commit, so the FK check cannot fail the batch.
+                            await cursor.execute(
+                                '''SELECT id FROM customers WHERE id = ANY(%s) FOR KEY SHARE''',
+                                (list({row[2] for row in rows}),)
+                            )
+                            known_customers = {row[0] for row in await cursor.fetchall()}
+                            timed.rows = len(known_customers)
+                            valid_rows = [row[1:] for row in rows if row[2] in known_customers]
+                            if valid_rows:
+                                ids, customer_ids, product_names, prices = zip(*valid_rows)
+                                await cursor.execute(
+                                    '''INSERT INTO orders (id, customer_id, product_name, price, created_at)
+                                       SELECT *, %s::timestamp FROM unnest(%s::text[], %s::text[], %s::text[], %s::numeric[])''',
+                                    (created_at, list(ids), list(customer_ids), list(product_names), list(prices))
+                                )
+            except psycopg.Error as e:
+                await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+        return _order_batch_response(rows, errors, known_customers, created_at)
+
+    async def ExportOrders(self, request, context):
+        try:
+            query, params = export_query(*_export_filters(request))
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "created_from and created_to must be ISO 8601 timestamps")
+
+        compress_stream(context)
+        try:
+            async with self.pool.connection() as conn:
+                # A named cursor keeps the result set on the server and hands
+                # it out EXPORT_BATCH_SIZE rows at a time.
+                async with conn.cursor(name=f"export_orders_{uuid.uuid4().hex}") as cursor:
+                    cursor.itersize = EXPORT_BATCH_SIZE
+                    with timed_query():
+                        await cursor.execute(query, params)
+                    while True:
+                        with timed_query() as timed:
+                            rows = await cursor.fetchmany(EXPORT_BATCH_SIZE)
+                            timed.rows = len(rows)
+                        if not rows:
+                            break
+                        for row in rows:
+                            yield _order_from_row(row)
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+    async def GetCustomerStats(self, request, context):
+        if not request.customer_id:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "customer_id is required")
+
+        try:
+            stats = await self.pool.execute(SELECT_CUSTOMER_STATS, (request.customer_id,), fetchone=True)
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+
+        if stats is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Customer not found")
+        return _customer_stats_response(request.customer_id, stats)
+
+    async def ListArchivedOrders(self, request, context):
+        if request.limit <= 0:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "limit must be a positive integer")
+        try:
+            after, customer_id, created_from, created_to = _archived_page_arguments(request)
+        except ValueError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor, created_from or created_to")
+
+        try:
+            orders = await self.pool.execute(
+                *_orders_page_query(
+                    request.limit, 0, after, customer_id, created_from, created_to, table="orders_archive"
+                ),
+                fetchall=True
+            )
+        except psycopg.Error as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Database error: {str(e)}")
+        return compress_large(context, _list_orders_response(request.limit, orders))
+
+
+async def _maintain_partitions(pool):
+    while True:
+        try:
+            await pool.execute(ENSURE_PARTITIONS, (ORDERS_PARTITIONS_AHEAD,))
+        except Exception as e:
+            print(f"Не удалось создать партиции заказов: {e}")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+
+
+async def _archive_old_orders(pool):
+    while True:
+        try:
+            cutoff = _retention_cutoff()
+            moved = 0
+            while True:
+                row = await pool.execute(ARCHIVE_ORDERS, (cutoff, ARCHIVE_BATCH_SIZE), fetchone=True)
+                ORDERS_ARCHIVED.inc(value=row[0])
+                moved += row[0]
+                if row[0] < ARCHIVE_BATCH_SIZE:
+                    break
+                await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
+            await pool.execute(DROP_EMPTY_PARTITIONS, (cutoff.date(),))
+            if moved:
+                print(f"В архив перенесено заказов: {moved}")
+        except Exception as e:
+            print(f"Не удалось перенести заказы в архив: {e}")
+        await asyncio.sleep(RETENTION_CHECK_INTERVAL)
+
+
+def _migrate():
+    conn = psycopg2.connect(**POSTGRES_CONFIG)
+    try:
+        apply_migrations(conn, "order_service", MIGRATIONS)
+    finally:
+        conn.close()
+
+
+async def serve_aio(worker=0):
+    _migrate()
+    pool = AsyncPostgresPool(POSTGRES_CONFIG, **AIO_POOL_CONFIG)
+    await pool.open()
+    server = grpc.aio.server(interceptors=[AsyncMetricsInterceptor()], options=server_options(reuse_port=GRPC_WORKERS > 1))
+    service = AsyncOrderService(pool)
+    add_OrderServiceServicer_to_server(service, server)
+    server.add_insecure_port('[::]:50052')
+    print("Order Service (grpc.aio) запущен на порту 50052")
+    metrics_port = worker_metrics_port(METRICS_PORT, worker)
+    if metrics_port:
+        REGISTRY.register_collector(pool_collector(pool))
+        try:
+            start_metrics_server(metrics_port)
+            print(f"Метрики Prometheus: http://{METRICS_HOST}:{metrics_port}/metrics")
+        except OSError as e:
+            # Without metrics the worker is still useful; exiting would
+            # only make the supervisor restart it over and over.
+            print(f"Не удалось запустить метрики на порту {metrics_port}: {e}")
+    await server.start()
+    maintenance = [asyncio.create_task(_maintain_partitions(pool))]
+    if ORDERS_RETENTION_DAYS > 0:
+        maintenance.append(asyncio.create_task(_archive_old_orders(pool)))
+    try:
+        await server.wait_for_termination()
+    finally:
+        for task in maintenance:
+            task.cancel()
+        await pool.close()